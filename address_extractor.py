@@ -0,0 +1,147 @@
+import re
+from email.header import decode_header
+
+# Address headers extracted from a message, lower-cased for matching
+ADDRESS_FIELDS = (b"from", b"to", b"cc", b"bcc", b"reply-to")
+
+# One alternation covering every token of an address list. Order matters:
+# quoted strings, comments and encoded words are consumed whole so commas,
+# '@' and angle brackets inside them never split or fake an address.
+TOKEN_RE = re.compile(
+    rb'"(?:[^"\\]|\\.)*"?'  # quoted string (tolerates a missing closing quote)
+    rb"|\((?:[^()\\]|\\.)*\)"  # comment
+    rb"|=\?[^?\s]+\?[bBqQ]\?[^?\s]*\?="  # RFC 2047 encoded word
+    rb"|<[^<>]*>"  # angle address
+    rb"|[,;:]"  # mailbox / group separators
+    rb'|[^\s",;:<>()]+'  # atom or bare addr-spec
+    rb"|[()<>]"  # stray delimiters
+)
+
+ADDR_SPEC_RE = re.compile(
+    rb"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    rb"@(?:[A-Za-z0-9](?:[A-Za-z0-9-]*[A-Za-z0-9])?\.)+[A-Za-z]{2,}"
+)
+ADDR_SEARCH_RE = re.compile(
+    r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~.-]+@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}"
+)
+
+# Values containing none of these bytes are plain comma-separated lists of
+# "addr" or "Name <addr>" and skip the tokenizer
+COMPLEX_BYTES = re.compile(rb'["():;]|=\?')
+ANGLE_RE = re.compile(rb"<([^<>]*)>")
+
+# Delimiters that end a mailbox: ',' between mailboxes, ':' after a group
+# display name and ';' at the end of a group
+SEPARATORS = (b",", b";", b":")
+
+
+def _normalize(addr_spec):
+    addr_spec = addr_spec.strip(b" \t.'")
+    if ADDR_SPEC_RE.fullmatch(addr_spec):
+        return addr_spec.decode("ascii").lower()
+    return None
+
+
+def _angle_address(token):
+    # Drop obsolete source routes such as <@relay.example:user@example.com>
+    inner = token[1:-1].strip()
+    if inner.startswith(b"@") and b":" in inner:
+        inner = inner.split(b":", 1)[1]
+    return _normalize(inner)
+
+
+def _decoded_addresses(token):
+    # Broken mailers sometimes encode a whole "Name <addr>" mailbox; decode the
+    # word and pick up any address hidden inside it
+    try:
+        text = "".join(
+            (
+                part.decode(charset or "ascii", "replace")
+                if isinstance(part, bytes)
+                else part
+            )
+            for part, charset in decode_header(token.decode("ascii"))
+        )
+    except Exception:
+        return []
+    return [a.lower() for a in ADDR_SEARCH_RE.findall(text)]
+
+
+def _simple_address_list(value):
+    addresses = []
+    for part in value.split(b","):
+        if b"<" in part:
+            match = ANGLE_RE.search(part)
+            addr = _normalize(match.group(1)) if match else None
+            if addr:
+                addresses.append(addr)
+        else:
+            for word in part.split():
+                if b"@" in word:
+                    addr = _normalize(word)
+                    if addr:
+                        addresses.append(addr)
+    return addresses
+
+
+# A mailbox yields its angle address if it has one, otherwise any bare
+# addr-specs, and only as a last resort addresses hidden in encoded words
+def _close_mailbox(addresses, angle, bare, encoded):
+    if angle:
+        addresses.append(angle)
+    elif bare:
+        addresses.extend(bare)
+    else:
+        for token in encoded:
+            addresses.extend(_decoded_addresses(token))
+
+
+def extract_address_list(value):
+    if isinstance(value, str):
+        value = value.encode("utf-8", "surrogateescape")
+
+    if not COMPLEX_BYTES.search(value):
+        return _simple_address_list(value)
+
+    addresses = []
+    angle = None
+    bare = []
+    encoded = []
+
+    for token in TOKEN_RE.findall(value):
+        first = token[:1]
+        if token in SEPARATORS:
+            _close_mailbox(addresses, angle, bare, encoded)
+            angle, bare, encoded = None, [], []
+        elif first == b"<" and token.endswith(b">"):
+            angle = _angle_address(token) or angle
+        elif first == b"(":
+            continue
+        elif first == b'"':
+            # An unterminated quote swallows the rest of the field; rescan it
+            if len(token) == 1 or not token.endswith(b'"'):
+                bare.extend(extract_address_list(token[1:]))
+        elif token.startswith(b"=?") and token.endswith(b"?="):
+            # Only decoded if the mailbox turns out to have no plain address
+            encoded.append(token)
+        elif b"@" in token:
+            addr = _normalize(token)
+            if addr:
+                bare.append(addr)
+
+    _close_mailbox(addresses, angle, bare, encoded)
+    return addresses
+
+
+# Extract every address from the address fields of a raw header block
+# (bytes, as returned by BODY.PEEK[HEADER.FIELDS ...] or read from a file)
+def extract_addresses(raw_headers, fields=ADDRESS_FIELDS):
+    emails = set()
+    # Unfold continuation lines (RFC 5322 folding) with plain byte operations
+    unfolded = raw_headers.replace(b"\r\n", b"\n")
+    unfolded = unfolded.replace(b"\n ", b" ").replace(b"\n\t", b"\t")
+    for line in unfolded.split(b"\n"):
+        name, sep, value = line.partition(b":")
+        if sep and name.strip().lower() in fields:
+            emails.update(extract_address_list(value))
+    return emails
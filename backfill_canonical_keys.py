@@ -0,0 +1,103 @@
+import argparse
+import io
+import time
+
+import db
+from canonical import canonical_key
+
+# Tables carrying a canonical_key column, see migrations/003_canonical_keys.sql
+TABLES = [
+    "personal_emails",
+    "business_emails",
+    "sent_emails",
+    "unsubscribe_emails",
+    "eligible_recipients",
+]
+
+BATCH_SIZE = 10_000
+
+
+# Fill canonical_key for rows that predate migration 003, one committed batch
+# at a time walking the email index, so the job can be stopped and resumed
+# and never holds long locks
+def backfill_table(table, batch_size):
+    updated = 0
+    last_email = ""
+    while True:
+        with db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT email FROM {table} "
+                    f"WHERE email > %s AND canonical_key IS NULL "
+                    f"ORDER BY email LIMIT %s;",
+                    (last_email, batch_size),
+                )
+                emails = [row[0] for row in cursor.fetchall()]
+                if not emails:
+                    break
+
+                buffer = io.StringIO()
+                for email_address in emails:
+                    buffer.write(f"{email_address}\t{canonical_key(email_address)}\n")
+                buffer.seek(0)
+                cursor.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS canonical_staging "
+                    "(email text, canonical_key text) ON COMMIT DELETE ROWS;"
+                )
+                cursor.copy_from(
+                    buffer, "canonical_staging", columns=("email", "canonical_key")
+                )
+                cursor.execute(
+                    f"UPDATE {table} t SET canonical_key = s.canonical_key "
+                    f"FROM canonical_staging s WHERE t.email = s.email;"
+                )
+                updated += cursor.rowcount
+        last_email = emails[-1]
+        print(f"  {table}: {updated} rows keyed...")
+    return updated
+
+
+# Once every row has a key, spellings of the same mailbox queued separately
+# (or queued although another spelling was already mailed) are removed
+def collapse_eligible():
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM eligible_recipients e "
+                "USING eligible_recipients d "
+                "WHERE e.canonical_key = d.canonical_key AND e.id > d.id;"
+            )
+            duplicates = cursor.rowcount
+            cursor.execute(
+                "DELETE FROM eligible_recipients e "
+                "WHERE EXISTS (SELECT 1 FROM sent_emails s "
+                "              WHERE s.canonical_key = e.canonical_key) "
+                "   OR EXISTS (SELECT 1 FROM unsubscribe_emails u "
+                "              WHERE u.canonical_key = e.canonical_key);"
+            )
+            suppressed = cursor.rowcount
+    return duplicates, suppressed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Backfill canonical_key for rows written before migration 003"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    for table in TABLES:
+        updated = backfill_table(table, args.batch_size)
+        print(f"✅ {table}: {updated} rows backfilled")
+
+    duplicates, suppressed = collapse_eligible()
+    print(
+        f"✅ eligible_recipients: removed {duplicates} duplicate spellings and "
+        f"{suppressed} already sent/unsubscribed "
+        f"in {time.monotonic() - started:.1f}s total"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import argparse
+import base64
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from address_extractor import extract_addresses  # noqa: E402
+
+FIRST_NAMES = ["John", "Jane", "Jörg", "Zoë", "Ana", "Li", "Søren", "Marie", "Ömer"]
+LAST_NAMES = ["Smith", "O'Neil", "Doe", "Müller", "García", "Nguyen", "Kowalski"]
+DOMAINS = [
+    "gmail.com",
+    "outlook.com",
+    "yahoo.co.uk",
+    "mail.example-business.com",
+    "sub.domain.org",
+    "gardensauna.co.uk",
+    "hotmail.fr",
+]
+
+
+def random_address(rng):
+    local = rng.choice(
+        [
+            f"{rng.choice(FIRST_NAMES).lower()}.{rng.randint(1, 9999)}",
+            f"user{rng.randint(1, 10**6)}",
+            f"info+tag{rng.randint(1, 99)}",
+            f"first_last-{rng.randint(1, 999)}",
+        ]
+    )
+    local = local.encode("ascii", "ignore").decode()
+    return f"{local}@{rng.choice(DOMAINS)}"
+
+
+def encoded_word(text, rng):
+    raw = text.encode("utf-8")
+    if rng.random() < 0.5:
+        return f"=?UTF-8?B?{base64.b64encode(raw).decode()}?="
+    q = "".join(
+        chr(b) if chr(b).isascii() and chr(b).isalnum() else f"={b:02X}" for b in raw
+    )
+    return f"=?UTF-8?Q?{q}?="
+
+
+# One mailbox in a random shape; returns (header text, expected addresses)
+def random_mailbox(rng):
+    addr = random_address(rng)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    shape = rng.randrange(8)
+    if shape == 0:
+        return addr, [addr]
+    if shape == 1:
+        return f"{name.encode('ascii', 'ignore').decode()} <{addr.upper()}>", [addr]
+    if shape == 2:
+        return f'"{name.split()[1]}, {name.split()[0]}" <{addr}>', [addr]
+    if shape == 3:
+        # Encoded display names may hide commas and fake addresses
+        return f"{encoded_word(name + ', fake@spam.com', rng)} <{addr}>", [addr]
+    if shape == 4:
+        return f"{addr} ({name}, via list)", [addr]
+    if shape == 5:
+        return f'"quoted \\"name\\" with <x@fake.com>" <{addr}>', [addr]
+    if shape == 6:
+        return f"{encoded_word(f'{name} <{addr}>', rng)}", [addr]
+    return f"<@relay.example.net:{addr}>", [addr]
+
+
+def random_address_list(rng):
+    if rng.random() < 0.05:
+        return "undisclosed-recipients:;", []
+    count = rng.choice([1, 1, 1, 2, 3, 8])
+    parts, expected = [], []
+    for _ in range(count):
+        text, addrs = random_mailbox(rng)
+        parts.append(text)
+        expected.extend(addrs)
+    if count > 2 and rng.random() < 0.3:
+        return f"Team {rng.randint(1, 9)}: {', '.join(parts)};", expected
+    # Fold long lists over several lines like real mailers do
+    return ",\r\n ".join(parts), expected
+
+
+def generate_corpus(count, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        lines, expected = [], set()
+        for field in ["From", "To", "Cc", "Reply-To"]:
+            if field != "From" and rng.random() < 0.5:
+                continue
+            value, addrs = random_address_list(rng)
+            lines.append(f"{field}: {value}")
+            expected.update(a.lower() for a in addrs)
+        # Non-address fields must never contribute addresses
+        lines.append(f"Subject: Re: message from {random_address(rng)}")
+        raw = ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+        corpus.append((raw, expected))
+    return corpus
+
+
+LEGACY_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.[\w]{2,}")
+
+
+# The previous split-on-comma implementation, kept for comparison
+def legacy_extract(raw):
+    from email.parser import BytesHeaderParser
+
+    msg = BytesHeaderParser().parsebytes(raw)
+    emails = set()
+    for header in ["From", "To", "Cc", "Bcc", "Reply-To"]:
+        value = msg.get(header)
+        if value:
+            for part in str(value).split(","):
+                match = LEGACY_RE.search(part)
+                if match:
+                    emails.add(match.group(0).strip().lower())
+    return emails
+
+
+def run(extractor, corpus):
+    mismatches = 0
+    started = time.perf_counter()
+    for raw, expected in corpus:
+        if extractor(raw) != expected:
+            mismatches += 1
+    elapsed = time.perf_counter() - started
+    return elapsed, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Correctness check and benchmark for address_extractor"
+    )
+    parser.add_argument("--headers", type=int, default=300_000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument(
+        "--legacy", action="store_true", help="also run the old extractor"
+    )
+    args = parser.parse_args()
+
+    print(f"Generating {args.headers} synthetic header blocks (seed {args.seed})...")
+    corpus = generate_corpus(args.headers, args.seed)
+
+    results = [("address_extractor", extract_addresses)]
+    if args.legacy:
+        results.append(("legacy", legacy_extract))
+
+    failed = False
+    for name, extractor in results:
+        elapsed, mismatches = run(extractor, corpus)
+        rate = len(corpus) / elapsed if elapsed else 0
+        print(
+            f"{name}: {rate:,.0f} headers/sec ({elapsed:.2f}s), "
+            f"{mismatches} mismatches out of {len(corpus)}"
+        )
+        if name == "address_extractor" and mismatches:
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import domain_classifier  # noqa: E402
+
+
+def write_rules(directory, rule_count, rng):
+    with open(os.path.join(directory, "freemail.txt"), "w") as f:
+        f.write("gmail.com\nhotmail.co.uk\n")
+        for i in range(rule_count):
+            f.write(f"free{i}.example{rng.randint(1, 50)}.com\n")
+    with open(os.path.join(directory, "disposable.txt"), "w") as f:
+        for i in range(rule_count):
+            f.write(f"temp{i}.net\n")
+    with open(os.path.join(directory, "denylist_local.txt"), "w") as f:
+        f.write("no-reply\nnoreply\nbounce\n")
+    with open(os.path.join(directory, "role_accounts.txt"), "w") as f:
+        f.write("info\nsales\n")
+
+
+def run(rule_count, addresses, rng):
+    with tempfile.TemporaryDirectory() as directory:
+        write_rules(directory, rule_count, rng)
+        domain_classifier.DOMAIN_DATA_DIR = directory
+        classifier = domain_classifier.DomainClassifier()
+
+    domains = [f"sub{i % 5000}.company{i % 20000}.co.uk" for i in range(addresses)]
+    emails = [f"user{i}@{domain}" for i, domain in enumerate(domains)]
+
+    started = time.perf_counter()
+    classifier.classify_batch(emails)
+    elapsed = time.perf_counter() - started
+    return addresses / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Classification throughput for growing rule sets"
+    )
+    parser.add_argument("--addresses", type=int, default=500_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    for rule_count in (10, 1_000, 10_000, 100_000):
+        rate = run(rule_count, args.addresses, rng)
+        print(f"{rule_count * 2:>7} domain rules: {rate:,.0f} addresses/sec")
+
+
+if __name__ == "__main__":
+    main()
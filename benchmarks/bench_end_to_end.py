@@ -0,0 +1,330 @@
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Metrics checked for regressions, and whether higher values are better
+CHECKED_METRICS = {
+    "messages_per_sec": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+    "incremental_seconds": False,
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(count, elapsed, latencies):
+    return {
+        "messages": count,
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(count / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+# Extraction: IMAP stand-in -> extract_hostinger_emails pipeline -> null DB.
+# Per-message latency runs from the server writing a message's headers to
+# the DB commit that stores its sender address. A second, incremental pass
+# then adds --new-messages to each mailbox and resumes from the first pass's
+# checkpoints; it must fetch exactly the new UIDs.
+def run_extract(args):
+    sys.path.insert(0, BENCH_DIR)
+    from standins import SENDER_RE, ImapStandIn, NullDatabase
+
+    account = "bench@gardensauna.co.uk"
+    mailboxes = {"INBOX": args.messages, "INBOX.Sent": max(1, args.messages // 4)}
+    imap = ImapStandIn(mailboxes, account).start()
+    workdir = tempfile.mkdtemp(prefix="bench-extract-")
+    os.environ.update(
+        IMAP_SERVER="127.0.0.1",
+        IMAP_PORT=str(imap.port),
+        IMAP_SSL="FALSE",
+        EMAIL_ACCOUNT=account,
+        EMAIL_PASSWORD="bench",
+        SMTP_PORT=os.getenv("SMTP_PORT", "587"),
+        MAILBOXES=",".join(mailboxes),
+        IMAP_WORKERS=str(args.imap_workers),
+        ACCOUNTS_FILE="",
+        KNOWN_CACHE="FALSE",
+        SYNC_STATE_FILE=os.path.join(workdir, "sync_state.json"),
+        EVENT_LOG_FILE=os.path.join(workdir, "events.jsonl"),
+    )
+
+    import db
+    import extract_hostinger_emails as extractor
+
+    latencies = []
+
+    def on_commit(addresses, committed):
+        for address in addresses:
+            match = SENDER_RE.match(address)
+            if match:
+                key = (int(match.group(1)), int(match.group(2)))
+                served = imap.served.get(key)
+                if served is not None:
+                    latencies.append(committed - served)
+
+    db.get_connection = NullDatabase(on_commit).get_connection
+    (account_config,) = extractor.load_accounts()
+
+    def extract(sync_state):
+        started = time.perf_counter()
+        extractor.extract_account(account_config, sync_state)
+        elapsed = time.perf_counter() - started
+        accounts = extractor.report_data["accounts"]
+        error = accounts[account_config["name"]].get("error")
+        if error:
+            raise RuntimeError(f"extraction failed: {error}")
+        return elapsed
+
+    sync_state = {}
+    elapsed = extract(sync_state)
+    summary = summarize(len(imap.served), elapsed, latencies)
+
+    expected = set()
+    for mailbox_index, name in enumerate(mailboxes):
+        first_new = imap.mailboxes[name] + 1
+        imap.mailboxes[name] += args.new_messages
+        expected.update(
+            (mailbox_index, uid) for uid in range(first_new, imap.mailboxes[name] + 1)
+        )
+    with imap.lock:
+        imap.served = {}
+    incremental = extract(sync_state)
+    imap.stop()
+
+    fetched = set(imap.served)
+    if fetched != expected:
+        raise RuntimeError(
+            f"incremental sync fetched {len(fetched)} messages, expected the "
+            f"{len(expected)} new ones ({len(fetched - expected)} already seen, "
+            f"{len(expected - fetched)} missed)"
+        )
+    summary["incremental_messages"] = len(fetched)
+    summary["incremental_seconds"] = round(incremental, 3)
+    return summary
+
+
+# Sending: recipient list -> send_promotional_emails workers -> SMTP stand-in.
+# Per-message latency is the time send_email() takes, rate limiting excluded.
+def run_send(args):
+    sys.path.insert(0, BENCH_DIR)
+    from standins import SmtpStandIn, NullDatabase
+
+    smtp = SmtpStandIn(args.smtp_latency_ms, args.smtp_fault_rate).start()
+    workdir = tempfile.mkdtemp(prefix="bench-send-")
+    unlimited = str(10**9)
+    os.environ.update(
+        SMTP_SERVER="127.0.0.1",
+        SMTP_PORT=str(smtp.port),
+        SMTP_STARTTLS="FALSE",
+        EMAIL_ACCOUNT="bench@gardensauna.co.uk",
+        EMAIL_PASSWORD="bench",
+        SEND_WORKERS=str(args.send_workers),
+        SEND_RATE_PER_MINUTE=unlimited,
+        SEND_MAX_RATE_PER_MINUTE=unlimited,
+        SEND_DOMAIN_RATE_PER_MINUTE=unlimited,
+        SEND_BURST=unlimited,
+        SENT_JOURNAL_FILE=os.path.join(workdir, "sent_emails.journal"),
+        UNSUBSCRIBE_SECRET="bench-secret",
+        UNSUBSCRIBE_BASE_URL="https://unsubscribe.example.com",
+        EVENT_LOG_FILE=os.path.join(workdir, "events.jsonl"),
+    )
+
+    import db
+
+    db.get_connection = NullDatabase().get_connection
+    os.chdir(ROOT)
+    import send_promotional_emails as sender
+
+    latencies = []
+    send_email = sender.send_email
+
+    def timed_send_email(*send_args):
+        started = time.perf_counter()
+        try:
+            return send_email(*send_args)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    sender.send_email = timed_send_email
+    domains = ["gmail.com", "outlook.com", "example-business.com", "icloud.com"]
+    recipients = [
+        f"customer{i}@{domains[i % len(domains)]}" for i in range(args.recipients)
+    ]
+
+    sender.SENT_LOG.start()
+    # No change feed from the null database; the set starts out empty and
+    # only gains the addresses sent during the run
+    sender.SUPPRESSION.current.set()
+    started = time.perf_counter()
+    results = sender.send_list(recipients)
+    elapsed = time.perf_counter() - started
+    sender.SENT_LOG.close()
+    smtp.stop()
+
+    summary = summarize(results["success"], elapsed, latencies)
+    summary["failed"] = results["failure"]
+    return summary
+
+
+def git_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Each pipeline runs in its own interpreter, so settings read at import time
+# and peak memory are not shared between them
+def run_child(pipeline, args):
+    command = [sys.executable, os.path.abspath(__file__), "--child", pipeline]
+    for name, value in vars(args).items():
+        if name not in ("child", "only", "save", "threshold"):
+            command += [f"--{name.replace('_', '-')}", str(value)]
+    proc = subprocess.run(command, capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{pipeline} benchmark failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def previous_result(params):
+    for path in sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")), reverse=True):
+        with open(path, "r") as f:
+            result = json.load(f)
+        if result.get("params") == params:
+            return path, result
+    return None, None
+
+
+def compare(current, previous, threshold):
+    regressions = []
+    for pipeline, metrics in current.items():
+        old = previous.get(pipeline, {})
+        for metric, higher_is_better in CHECKED_METRICS.items():
+            if not old.get(metric) or metric not in metrics:
+                continue
+            value = metrics[metric]
+            change = (value - old[metric]) / old[metric]
+            worse = -change > threshold if higher_is_better else change > threshold
+            flag = "  ⚠️ REGRESSION" if worse else ""
+            print(
+                f"  {pipeline}.{metric}: {old[metric]} -> {value} "
+                f"({change:+.1%}){flag}"
+            )
+            if worse:
+                regressions.append(f"{pipeline}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-end throughput of the extractor and sender against "
+        "local IMAP/SMTP stand-ins"
+    )
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument(
+        "--new-messages",
+        type=int,
+        default=500,
+        help="messages added per mailbox before the incremental extraction pass",
+    )
+    parser.add_argument("--recipients", type=int, default=2_000)
+    parser.add_argument("--imap-workers", type=int, default=2)
+    parser.add_argument("--send-workers", type=int, default=4)
+    parser.add_argument("--smtp-latency-ms", type=float, default=5.0)
+    parser.add_argument("--smtp-fault-rate", type=float, default=0.01)
+    parser.add_argument("--only", choices=["extract", "send"])
+    parser.add_argument(
+        "--no-save", dest="save", action="store_false", help="do not store results"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="relative change reported as a regression",
+    )
+    parser.add_argument("--child", choices=["extract", "send"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        result = run_extract(args) if args.child == "extract" else run_send(args)
+        print(json.dumps(result))
+        return
+
+    pipelines = [args.only] if args.only else ["extract", "send"]
+    results = {}
+    for pipeline in pipelines:
+        results[pipeline] = run_child(pipeline, args)
+        metrics = results[pipeline]
+        print(
+            f"{pipeline}: {metrics['messages']} messages in {metrics['seconds']}s, "
+            f"{metrics['messages_per_sec']:,.0f} msgs/sec, "
+            f"p50 {metrics['p50_ms']} ms, p99 {metrics['p99_ms']} ms, "
+            f"peak RSS {metrics['peak_rss_mb']} MB"
+        )
+        if "incremental_seconds" in metrics:
+            print(
+                f"{pipeline} (incremental): {metrics['incremental_messages']} new "
+                f"messages in {metrics['incremental_seconds']}s"
+            )
+
+    params = {
+        name: value
+        for name, value in vars(args).items()
+        if name not in ("child", "save", "threshold")
+    }
+    path, previous = previous_result(params)
+    regressions = []
+    if previous:
+        print(f"Compared with {os.path.basename(path)} ({previous['version']}):")
+        regressions = compare(results, previous["results"], args.threshold)
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        version = git_version()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out_path = os.path.join(RESULTS_DIR, f"{stamp}-{version}.json")
+        with open(out_path, "w") as f:
+            json.dump(
+                {"version": version, "params": params, "results": results},
+                f,
+                indent=2,
+            )
+        print(f"Results saved to {os.path.relpath(out_path, ROOT)}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import email
+import os
+import sys
+import time
+from email import policy
+from email.generator import BytesGenerator
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mime_templates import CompiledTemplate  # noqa: E402
+
+SUBJECT = "🔥 Give Your Sauna a Refresh!"
+SENDER = "info@gardensauna.co.uk"
+
+
+def link(recipient):
+    return f"http://35.176.53.188:5000/unsubscribe?email={recipient}"
+
+
+# What send_email did before: str.replace, a fresh MIMEMultipart and a full
+# serialization (as smtplib.send_message does) for every recipient
+def legacy_render(template, recipient):
+    msg = MIMEMultipart("alternative")
+    msg["From"] = SENDER
+    msg["To"] = recipient
+    msg["Subject"] = SUBJECT
+    html = template.replace("{{ unsubscribe_link }}", link(recipient))
+    msg.attach(MIMEText(html, "html"))
+    out = BytesIO()
+    BytesGenerator(out, policy=msg.policy.clone(linesep="\r\n")).flatten(msg)
+    return out.getvalue()
+
+
+# The compiled message must decode to the same HTML the old code sent
+def check(compiled, template, recipient):
+    raw = compiled.render(recipient, unsubscribe_link=link(recipient))
+    message = email.message_from_bytes(raw, policy=policy.default)
+    html = message.get_body(("html",)).get_content().replace("\r\n", "\n")
+    expected = template.replace("{{ unsubscribe_link }}", link(recipient))
+    assert html == expected, "HTML part differs from the legacy rendering"
+    text = message.get_body(("plain",)).get_content()
+    assert link(recipient) in text, "plain-text part is missing the link"
+    assert str(message["Subject"]) == SUBJECT
+    for line in raw.split(b"\r\n"):
+        assert len(line) <= 78, f"line over 78 characters: {line!r}"
+
+
+def rate(func, count):
+    started = time.perf_counter()
+    for i in range(count):
+        func(f"customer.{i}@example.com")
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Campaign message render speed")
+    parser.add_argument("--messages", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for name in ("email_template_sauna.html", "email_template.html"):
+        with open(os.path.join(ROOT, name), "r", encoding="utf-8") as f:
+            template = f.read()
+        compiled = CompiledTemplate(template, SUBJECT, SENDER)
+        check(compiled, template, "J.Doe+news@example.com")
+
+        legacy = rate(lambda r: legacy_render(template, r), args.messages)
+        fast = rate(
+            lambda r: compiled.render(r, unsubscribe_link=link(r)), args.messages
+        )
+        print(
+            f"{name}: legacy {legacy:,.0f} msgs/sec, compiled {fast:,.0f} msgs/sec "
+            f"({fast / legacy:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
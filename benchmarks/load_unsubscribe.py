@@ -0,0 +1,183 @@
+import argparse
+import http.client
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+ONE_CLICK_BODY = "List-Unsubscribe=One-Click"
+FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# Serve unsubscribe_app on a free local port with the database replaced by
+# the null stand-in; prints the port, then journal stats once terminated
+def serve_local():
+    from werkzeug.serving import make_server
+
+    sys.path.insert(0, BENCH_DIR)
+    workdir = tempfile.mkdtemp(prefix="load-unsubscribe-")
+    journal = os.path.join(workdir, "unsubscribe.journal")
+    os.environ["UNSUBSCRIBE_JOURNAL_FILE"] = journal
+    # Per-request access logging would dominate the measurement
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    import db
+    from standins import NullDatabase
+
+    db.get_connection = NullDatabase().get_connection
+    import unsubscribe_app
+
+    server = make_server("127.0.0.1", 0, unsubscribe_app.app, threaded=True)
+    signal.signal(
+        signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start()
+    )
+    unsubscribe_app.UNSUBSCRIBE_LOG.start()
+    print(server.server_port, flush=True)
+    server.serve_forever()
+    unsubscribe_app.UNSUBSCRIBE_LOG.close()
+    print(json.dumps(unsubscribe_app.UNSUBSCRIBE_LOG.stats), flush=True)
+
+
+# Each client thread keeps one connection open and sends requests back to
+# back, like a burst of clicks arriving through a proxy. Every other link is
+# unsubscribed with an RFC 8058 one-click POST, the rest like a reader
+# would: GET the confirmation page, then submit its form. Statuses are
+# counted per method, since only POSTs unsubscribe.
+def client(url, tokens, latencies, statuses, lock):
+    parts = urlsplit(url)
+    address = (parts.hostname, parts.port or 80)
+    conn = http.client.HTTPConnection(*address, timeout=30)
+    local_latencies = []
+    local_statuses = {}
+    for i, token in enumerate(tokens):
+        path = f"{parts.path or '/unsubscribe'}?token={token}"
+        if i % 2:
+            steps = [("POST", ONE_CLICK_BODY)]
+        else:
+            steps = [("GET", None), ("POST", "")]
+        for method, body in steps:
+            started = time.perf_counter()
+            try:
+                if body is None:
+                    conn.request(method, path)
+                else:
+                    conn.request(method, path, body, FORM_HEADERS)
+                response = conn.getresponse()
+                response.read()
+                status = f"{method} {response.status}"
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(*address, timeout=30)
+                status = f"{method} error"
+            local_latencies.append(time.perf_counter() - started)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        for status, count in local_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+
+def run_load(url, requests, concurrency):
+    import unsubscribe_tokens
+
+    # Signed like a campaign would be, so the service sees valid links
+    emails = [f"load{i}@example.com" for i in range(requests)]
+    tokens = list(unsubscribe_tokens.sign_batch(emails).values())
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=client,
+            args=(url, tokens[n::concurrency], latencies, statuses, lock),
+        )
+        for n in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{len(latencies)} requests for {requests} links in {elapsed:.2f}s with "
+        f"{concurrency} connections: {len(latencies) / elapsed:,.0f} req/sec, "
+        f"p50 {percentile(latencies, 0.50) * 1000:.2f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms"
+    )
+    print(f"Responses: {statuses}")
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test the unsubscribe endpoint with a burst of clicks"
+    )
+    parser.add_argument(
+        "--url",
+        help="endpoint of a running service, e.g. http://127.0.0.1:5000/unsubscribe; "
+        "by default a local server is started with a null database. Links are "
+        "signed with UNSUBSCRIBE_SECRET, which must match the service's",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=20_000, help="unsubscribe links to click"
+    )
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_local()
+        return
+
+    if args.url:
+        run_load(args.url, args.requests, args.concurrency)
+        return
+
+    # The local server and this client share a throwaway secret
+    os.environ.setdefault("UNSUBSCRIBE_SECRET", "load-test-secret")
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve"],
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=ROOT,
+    )
+    try:
+        port = int(server.stdout.readline())
+        statuses = run_load(
+            f"http://127.0.0.1:{port}/unsubscribe", args.requests, args.concurrency
+        )
+    finally:
+        server.terminate()
+    stats = json.loads(server.stdout.read().strip().splitlines()[-1])
+    server.wait()
+    print(
+        f"Journal: {stats['appended']} appended with {stats['fsyncs']} fsyncs, "
+        f"{stats['flushed']} written in {stats['batches']} batches"
+    )
+    if stats["flushed"] != statuses.get("POST 200", 0):
+        print("🚫 Not every acknowledged unsubscribe reached the database")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import random
+import re
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+
+# Local stand-ins for the services the pipelines talk to, so they can be
+# benchmarked end to end without mail accounts or a database:
+#   ImapStandIn  - serves synthetic mailboxes (the IMAP subset the extractor uses)
+#   SmtpStandIn  - accepts mail with injectable latency and 4xx faults
+#   NullDatabase - accepts the extractor's and sender's SQL without storing it
+
+PERSONAL_DOMAINS = ["gmail.com", "outlook.com", "yahoo.co.uk", "icloud.com"]
+BUSINESS_DOMAINS = ["gardensauna.co.uk", "example-business.com", "mail.acme.org"]
+
+# Senders are numbered so a stored address can be traced back to its message
+SENDER_RE = re.compile(r"m(\d+)u(\d+)@")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _StandIn:
+    handler = None
+
+    def start(self):
+        self.server = _Server(("127.0.0.1", 0), self.handler)
+        self.server.standin = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def synthetic_headers(mailbox_index, uid, account, rng):
+    domain = rng.choice(PERSONAL_DOMAINS + BUSINESS_DOMAINS)
+    lines = [
+        f'From: "Customer {uid}" <m{mailbox_index}u{uid}@{domain}>',
+        f"To: {account}",
+    ]
+    if uid % 5 == 0:
+        cc_domain = rng.choice(BUSINESS_DOMAINS)
+        lines.append(f"Cc: colleague{uid % 997}@{cc_domain}, {account}")
+    if uid % 11 == 0:
+        lines.append(f"Reply-To: replies{uid % 131}@{rng.choice(PERSONAL_DOMAINS)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("ascii")
+
+
+def _parse_uid_set(spec, highest):
+    uids = []
+    for part in spec.split(","):
+        start, _, stop = part.partition(":")
+        start = highest if start == "*" else int(start)
+        stop = start if not stop else (highest if stop == "*" else int(stop))
+        if start > stop:
+            start, stop = stop, start
+        uids.extend(range(start, min(stop, highest) + 1))
+    return uids
+
+
+class _ImapHandler(socketserver.StreamRequestHandler):
+    def write(self, data):
+        self.wfile.write(data)
+
+    def handle(self):
+        standin = self.server.standin
+        mailbox = None
+        self.write(b"* OK [CAPABILITY IMAP4rev1] stand-in ready\r\n")
+        for line in self.rfile:
+            parts = line.decode("utf-8", "replace").strip().split(" ", 2)
+            if len(parts) < 2:
+                continue
+            tag, command = parts[0], parts[1].upper()
+            args = parts[2] if len(parts) > 2 else ""
+
+            if command == "CAPABILITY":
+                self.write(b"* CAPABILITY IMAP4rev1\r\n")
+                self.write(f"{tag} OK CAPABILITY completed\r\n".encode())
+            elif command == "LOGIN":
+                self.write(f"{tag} OK LOGIN completed\r\n".encode())
+            elif command in ("SELECT", "EXAMINE"):
+                name = args.strip().strip('"')
+                if name not in standin.mailboxes:
+                    self.write(f"{tag} NO no such mailbox\r\n".encode())
+                    continue
+                mailbox = name
+                count = standin.mailboxes[name]
+                self.write(
+                    f"* {count} EXISTS\r\n"
+                    f"* OK [UIDVALIDITY {standin.uidvalidity}] UIDs valid\r\n"
+                    f"* OK [UIDNEXT {count + 1}] next UID\r\n"
+                    f"{tag} OK [READ-ONLY] {command} completed\r\n".encode()
+                )
+            elif command == "UID":
+                self.uid_command(tag, args, mailbox)
+            elif command == "LOGOUT":
+                self.write(f"* BYE\r\n{tag} OK LOGOUT completed\r\n".encode())
+                return
+            else:
+                self.write(f"{tag} OK {command} completed\r\n".encode())
+
+    def uid_command(self, tag, args, mailbox):
+        standin = self.server.standin
+        subcommand, _, rest = args.partition(" ")
+        highest = standin.mailboxes.get(mailbox, 0)
+
+        if subcommand.upper() == "SEARCH":
+            # Criteria come parenthesized, e.g. "(UID 101:*)"; anything
+            # but a UID range matches every message
+            criteria = rest.replace("(", " ").replace(")", " ").upper().split()
+            uids = range(1, highest + 1)
+            if "UID" in criteria[:-1]:
+                uids = _parse_uid_set(criteria[criteria.index("UID") + 1], highest)
+            found = " ".join(str(u) for u in uids)
+            self.write(f"* SEARCH {found}\r\n{tag} OK SEARCH completed\r\n".encode())
+            return
+
+        uid_set, _, _ = rest.partition(" ")
+        mailbox_index = list(standin.mailboxes).index(mailbox)
+        out = []
+        uids = _parse_uid_set(uid_set, highest)
+        for uid in uids:
+            headers = standin.headers(mailbox_index, uid)
+            out.append(
+                f"* {uid} FETCH (UID {uid} BODY[HEADER.FIELDS (FROM TO CC BCC "
+                f"REPLY-TO)] {{{len(headers)}}}\r\n".encode()
+            )
+            out.append(headers)
+            out.append(b")\r\n")
+        out.append(f"{tag} OK FETCH completed\r\n".encode())
+        self.write(b"".join(out))
+
+        served = time.perf_counter()
+        with standin.lock:
+            for uid in uids:
+                standin.served[(mailbox_index, uid)] = served
+
+
+class ImapStandIn(_StandIn):
+    handler = _ImapHandler
+
+    # mailboxes: {name: message count}; UIDs run from 1 to the count
+    def __init__(self, mailboxes, account, seed=1):
+        self.mailboxes = dict(mailboxes)
+        self.account = account
+        self.seed = seed
+        self.uidvalidity = 1
+        self.lock = threading.Lock()
+        self.served = {}
+
+    def headers(self, mailbox_index, uid):
+        rng = random.Random(self.seed * 1_000_003 + mailbox_index * 10_000_019 + uid)
+        return synthetic_headers(mailbox_index, uid, self.account, rng)
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        standin = self.server.standin
+        write = self.wfile.write
+        write(b"220 stand-in ESMTP\r\n")
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                write(b"250-stand-in\r\n250-8BITMIME\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif command == b"AUTH":
+                write(b"235 2.7.0 Authentication successful\r\n")
+            elif command == b"MAIL":
+                write(b"250 2.1.0 OK\r\n")
+            elif command == b"RCPT":
+                if standin.fault():
+                    write(b"451 4.7.1 Try again later\r\n")
+                else:
+                    write(b"250 2.1.5 OK\r\n")
+            elif command == b"DATA":
+                write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                size = 0
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                    size += len(data_line)
+                if standin.latency:
+                    time.sleep(standin.latency)
+                standin.accepted(size)
+                write(b"250 2.0.0 Queued\r\n")
+            elif command == b"QUIT":
+                write(b"221 2.0.0 Bye\r\n")
+                return
+            else:
+                write(b"250 2.0.0 OK\r\n")
+
+
+class SmtpStandIn(_StandIn):
+    handler = _SmtpHandler
+
+    # latency_ms is added before each message is acknowledged; fault_rate is
+    # the share of RCPT commands answered with 451
+    def __init__(self, latency_ms=0.0, fault_rate=0.0, seed=1):
+        self.latency = latency_ms / 1000
+        self.fault_rate = fault_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.bytes = 0
+
+    def fault(self):
+        with self.lock:
+            return self.rng.random() < self.fault_rate
+
+    def accepted(self, size):
+        with self.lock:
+            self.messages += 1
+            self.bytes += size
+
+
+class _NullCursor:
+    def __init__(self, database):
+        self.database = database
+        self.rows = []
+        self.rowcount = 0
+        self.itersize = 2000
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def execute(self, sql, params=None):
+        self.rows = []
+        self.rowcount = 0
+        # The extractor's set-based insert reports every staged address as new
+        if "FROM email_staging" in sql and "RETURNING" in sql:
+            category = params[0]
+            self.rows = [(e,) for e, c in self.database.staged if c == category]
+            self.rowcount = len(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def copy_from(self, f, table, columns=None):
+        for line in f.read().splitlines():
+            fields = line.split("\t")
+            category = fields[1] if len(fields) > 1 else None
+            self.database.staged.append((fields[0], category))
+
+    def copy_expert(self, sql, f):
+        f.read()
+
+    def close(self):
+        pass
+
+
+class _NullConnection:
+    closed = 0
+
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self, name=None):
+        return _NullCursor(self.database)
+
+
+# Accepts whatever SQL the pipelines send; commit() reports the addresses
+# staged in the transaction to on_commit(addresses, timestamp)
+class NullDatabase:
+    def __init__(self, on_commit=None):
+        self.on_commit = on_commit
+        self.staged = []
+        self.commits = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def get_connection(self):
+        with self.lock:
+            self.staged = []
+            yield _NullConnection(self)
+            self.commits += 1
+            if self.on_commit is not None:
+                self.on_commit([e for e, _ in self.staged], time.perf_counter())
+            self.staged = []
@@ -0,0 +1,235 @@
+import argparse
+import csv
+import io
+import json
+import re
+import sys
+import time
+from datetime import datetime
+
+import db
+from canonical import canonical_key
+
+# Tables the tool can load and dump, with their optional timestamp column
+TABLES = {
+    "sent_emails": "sent_at",
+    "unsubscribe_emails": None,
+    "personal_emails": None,
+    "business_emails": None,
+}
+
+EMAIL_RE = re.compile(r"[^@\s,;<>\"']+@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}")
+# Rows of the hand-written insert_sent.sql style files
+SQL_VALUES_RE = re.compile(r"VALUES\s*\(\s*'((?:[^']|'')*)'", re.IGNORECASE)
+
+
+def normalize(raw):
+    email_address = raw.strip().strip("<>").lower()
+    if EMAIL_RE.fullmatch(email_address):
+        return email_address
+    return None
+
+
+# sent_at values are checked here rather than left to the TIMESTAMPTZ cast,
+# where one bad value would fail the COPY and roll back the whole file.
+# Returns "" for a missing value and None for one that cannot be parsed.
+def parse_timestamp(raw):
+    if raw is None or not str(raw).strip():
+        return ""
+    value = str(raw).strip()
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        return None
+
+
+def read_rows(path, fmt):
+    f = sys.stdin if path == "-" else open(path, "r", newline="", encoding="utf-8")
+    try:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            first = next(reader, None)
+            # Header row is optional; anything that is not an address is skipped
+            if first and normalize(first[0]):
+                yield first[0], first[1] if len(first) > 1 else None
+            for row in reader:
+                if row:
+                    yield row[0], row[1] if len(row) > 1 else None
+        elif fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if isinstance(record, str):
+                        yield record, None
+                    else:
+                        yield record.get("email", ""), record.get("sent_at")
+        else:
+            for line in f:
+                match = SQL_VALUES_RE.search(line)
+                if match:
+                    yield match.group(1).replace("''", "'"), None
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+# Read-only file object that renders COPY text lines from a generator on
+# demand, so the input file is never held in memory
+class CopyStream(io.TextIOBase):
+    def __init__(self, lines):
+        self.lines = lines
+        self.buffer = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            data, self.buffer = self.buffer, ""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def _copy_value(value):
+    if value is None or value == "":
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", " ").replace("\n", " ")
+
+
+def import_file(table, path, fmt):
+    ts_column = TABLES[table]
+    counts = {"read": 0, "invalid": 0}
+
+    def lines():
+        for raw, ts in read_rows(path, fmt):
+            counts["read"] += 1
+            email_address = normalize(raw or "")
+            if not email_address:
+                counts["invalid"] += 1
+                continue
+            ts_value = parse_timestamp(ts) if ts_column else ""
+            if ts_value is None:
+                counts["invalid"] += 1
+                continue
+            key = canonical_key(email_address)
+            # EMAIL_RE lets a backslash through, which COPY would read as
+            # an escape
+            yield (
+                f"{_copy_value(email_address)}\t{_copy_value(key)}\t"
+                f"{_copy_value(ts_value)}\n"
+            )
+
+    started = time.monotonic()
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE bulk_staging "
+                "(email TEXT, canonical_key TEXT, ts TIMESTAMPTZ) ON COMMIT DROP;"
+            )
+            cursor.copy_expert(
+                "COPY bulk_staging (email, canonical_key, ts) FROM STDIN",
+                CopyStream(lines()),
+            )
+            # One row per mailbox: spelling variants in the file collapse to
+            # the first (or earliest) one, and mailboxes already stored under
+            # any spelling are skipped
+            columns, values, order = "email, canonical_key", "email, canonical_key", ""
+            if ts_column:
+                columns += f", {ts_column}"
+                values += ", COALESCE(ts, NOW())"
+                order = ", ts"
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) "
+                f"SELECT DISTINCT ON (canonical_key) {values} FROM bulk_staging s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table} t "
+                f"WHERE t.canonical_key = s.canonical_key) "
+                f"ORDER BY canonical_key{order} "
+                f"ON CONFLICT (email) DO NOTHING;"
+            )
+            inserted = cursor.rowcount
+
+    valid = counts["read"] - counts["invalid"]
+    print(
+        f"✅ {table}: read {counts['read']} rows, inserted {inserted}, "
+        f"skipped {valid - inserted} duplicates and {counts['invalid']} invalid "
+        f"in {time.monotonic() - started:.1f}s"
+    )
+    return inserted
+
+
+def export_file(table, path, fmt):
+    ts_column = TABLES[table]
+    columns = f"email, {ts_column}" if ts_column else "email"
+    out = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    started = time.monotonic()
+    rows = 0
+    try:
+        with db.get_connection() as conn:
+            if fmt == "csv":
+                with conn.cursor() as cursor:
+                    cursor.copy_expert(
+                        f"COPY (SELECT {columns} FROM {table} ORDER BY email) "
+                        f"TO STDOUT WITH CSV HEADER",
+                        out,
+                    )
+                    rows = cursor.rowcount
+            else:
+                with conn.cursor(name="bulk_export") as cursor:
+                    cursor.itersize = 50_000
+                    cursor.execute(f"SELECT {columns} FROM {table} ORDER BY email;")
+                    for row in cursor:
+                        record = {"email": row[0]}
+                        if ts_column:
+                            record[ts_column] = row[1].isoformat() if row[1] else None
+                        out.write(json.dumps(record) + "\n")
+                        rows += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(
+        f"✅ {table}: exported {rows} rows in {time.monotonic() - started:.1f}s",
+        file=sys.stderr,
+    )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bulk import/export of address and suppression lists"
+    )
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("path", help="file to read or write, '-' for stdin/stdout")
+    parser.add_argument(
+        "--format",
+        choices=["csv", "jsonl", "sql"],
+        help="defaults to the file extension; 'sql' reads insert_sent.sql style files",
+    )
+    args = parser.parse_args()
+
+    fmt = args.format or (args.path.rsplit(".", 1)[-1] if "." in args.path else "csv")
+    if fmt not in ("csv", "jsonl", "sql"):
+        parser.error(f"Unknown format {fmt!r}, use --format")
+
+    if args.action == "import":
+        import_file(args.table, args.path, fmt)
+    else:
+        if fmt == "sql":
+            parser.error("Export supports csv and jsonl only")
+        export_file(args.table, args.path, fmt)
+
+
+if __name__ == "__main__":
+    main()
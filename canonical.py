@@ -0,0 +1,59 @@
+# Canonical mailbox identity: every spelling that reaches the same inbox
+# maps to one key, e.g. J.Doe+news@googlemail.com -> jdoe@gmail.com.
+# The key is stored in the canonical_key column (migrations/003) and is what
+# dedupe and suppression checks compare.
+
+# Domains that are aliases of one mailbox provider
+DOMAIN_ALIASES = {
+    "googlemail.com": "gmail.com",
+    "googlemail.co.uk": "gmail.com",
+    "gmail.co.uk": "gmail.com",
+}
+
+# Providers that ignore dots in the local part
+DOTLESS_DOMAINS = {"gmail.com"}
+
+# Providers that deliver user+tag@ to user@
+PLUS_TAG_DOMAINS = {
+    "gmail.com",
+    "outlook.com",
+    "hotmail.com",
+    "hotmail.co.uk",
+    "live.com",
+    "live.co.uk",
+    "msn.com",
+    "icloud.com",
+    "me.com",
+    "mac.com",
+    "protonmail.com",
+    "protonmail.ch",
+    "proton.me",
+    "pm.me",
+    "fastmail.com",
+    "fastmail.fm",
+    "hey.com",
+}
+
+
+def canonical_key(email_address):
+    local, _, domain = email_address.strip().lower().rpartition("@")
+    if not local:
+        return email_address.strip().lower()
+
+    domain = DOMAIN_ALIASES.get(domain, domain)
+    if domain in PLUS_TAG_DOMAINS:
+        local = local.split("+", 1)[0]
+    if domain in DOTLESS_DOMAINS:
+        local = local.replace(".", "")
+    return f"{local}@{domain}"
+
+
+# Collapse spelling variants, keeping the first address seen for each key.
+# Returns {canonical_key: address}.
+def dedupe(emails, seen=None):
+    result = {}
+    for email_address in emails:
+        key = canonical_key(email_address)
+        if key not in result and (seen is None or key not in seen):
+            result[key] = email_address
+    return result
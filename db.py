@@ -0,0 +1,127 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# PostgreSQL credentials
+DB_HOST = os.getenv("DB_HOST")
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASS = os.getenv("DB_PASS")
+
+# Pool sizing; DB_POOL_MAX is also the number of callers that can hold a
+# connection at once, further callers wait for one to be returned
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+# Connections idle for longer than this are probed with SELECT 1 on checkout
+DB_HEALTHCHECK_IDLE_SECONDS = float(os.getenv("DB_HEALTHCHECK_IDLE_SECONDS", "30"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_last_used = {}
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool.ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    host=DB_HOST,
+                    database=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASS,
+                )
+    return _pool
+
+
+def _healthy(conn):
+    if conn.closed:
+        return False
+    idle = time.monotonic() - _last_used.get(id(conn), 0)
+    if idle < DB_HEALTHCHECK_IDLE_SECONDS:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1;")
+        conn.rollback()
+        return True
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+
+
+def _checkout():
+    db_pool = get_pool()
+    # A dead connection is discarded and replaced; give up after trying as
+    # many connections as the pool can hold
+    for _ in range(DB_POOL_MAX + 1):
+        conn = db_pool.getconn()
+        if _healthy(conn):
+            return conn
+        _last_used.pop(id(conn), None)
+        db_pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("Could not get a healthy database connection")
+
+
+def _release(conn, close=False):
+    _last_used[id(conn)] = time.monotonic()
+    if close or conn.closed:
+        _last_used.pop(id(conn), None)
+        close = True
+    get_pool().putconn(conn, close=close)
+
+
+# Borrow a pooled connection for one unit of work. The transaction is
+# committed when the block exits cleanly and rolled back otherwise.
+@contextmanager
+def get_connection():
+    _slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn = _checkout()
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        if conn is not None:
+            _release(conn, close=broken)
+        _slots.release()
+
+
+# A dedicated connection outside the pool, for sessions that must stay open
+# on their own (e.g. LISTEN); the caller closes it
+def connect():
+    return psycopg2.connect(
+        host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS
+    )
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
+
+atexit.register(close_pool)
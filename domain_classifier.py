@@ -0,0 +1,114 @@
+import os
+import re
+
+# Rule files live here, one entry per line, '#' starts a comment
+DOMAIN_DATA_DIR = os.getenv(
+    "DOMAIN_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "domains"),
+)
+
+PERSONAL = "personal"
+BUSINESS = "business"
+ROLE = "role"
+DISPOSABLE = "disposable"
+DENIED = "denied"
+
+# Categories that are never written to the database
+DROPPED_CATEGORIES = {DISPOSABLE, DENIED}
+
+# Domain rule files; when two files list the same suffix the higher
+# priority category wins
+DOMAIN_RULE_FILES = [
+    ("freemail.txt", PERSONAL, 1),
+    ("disposable.txt", DISPOSABLE, 2),
+    ("denylist_domains.txt", DENIED, 3),
+]
+
+# Cap on the per-domain result cache; real mail has few distinct domains
+DOMAIN_CACHE_SIZE = 200_000
+
+
+def _read_rules(filename):
+    path = os.path.join(DOMAIN_DATA_DIR, filename)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.split("#", 1)[0].strip().lower() for line in f)
+        return [line for line in lines if line]
+
+
+# Domains are indexed by their labels in reverse (com -> gmail), so a lookup
+# walks at most as many dict levels as the domain has labels, no matter how
+# many rules are loaded. The deepest rule on the path wins, which makes
+# "hotmail.co.uk" match mail.hotmail.co.uk but not hotmail.co.uk.evil.com.
+class DomainClassifier:
+    def __init__(self):
+        self.root = {}
+        self.domain_cache = {}
+        self.role_accounts = set(_read_rules("role_accounts.txt"))
+
+        for filename, category, priority in DOMAIN_RULE_FILES:
+            for domain in _read_rules(filename):
+                node = self.root
+                for label in reversed(domain.strip(".").split(".")):
+                    node = node.setdefault(label, {})
+                current = node.get(None)
+                if current is None or current[1] < priority:
+                    node[None] = (category, priority)
+
+        patterns = _read_rules("denylist_local.txt")
+        self.denied_local = (
+            re.compile("|".join(re.escape(p) for p in patterns)) if patterns else None
+        )
+
+    def classify_domain(self, domain):
+        category = self.domain_cache.get(domain)
+        if category is not None:
+            return category
+
+        category = BUSINESS
+        node = self.root
+        for label in reversed(domain.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            rule = node.get(None)
+            if rule is not None:
+                category = rule[0]
+
+        if len(self.domain_cache) >= DOMAIN_CACHE_SIZE:
+            self.domain_cache.clear()
+        self.domain_cache[domain] = category
+        return category
+
+    def classify(self, email_address):
+        local, _, domain = email_address.rpartition("@")
+        category = self.classify_domain(domain)
+        if category in DROPPED_CATEGORIES:
+            return category
+        if self.denied_local is not None and self.denied_local.search(local):
+            return DENIED
+        if category == BUSINESS and local in self.role_accounts:
+            return ROLE
+        return category
+
+    # Classify many addresses at once, returning {category: set of addresses}
+    def classify_batch(self, emails):
+        result = {
+            category: set()
+            for category in (PERSONAL, BUSINESS, ROLE, DISPOSABLE, DENIED)
+        }
+        classify = self.classify
+        for email_address in emails:
+            result[classify(email_address)].add(email_address)
+        return result
+
+
+_classifier = None
+
+
+def get_classifier():
+    global _classifier
+    if _classifier is None:
+        _classifier = DomainClassifier()
+    return _classifier
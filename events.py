@@ -0,0 +1,237 @@
+import argparse
+import atexit
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Structured event log shared by the scripts: one JSON object per line, each
+# tagged with the run it belongs to. An empty EVENT_LOG_FILE turns it off.
+EVENT_LOG_FILE = os.getenv("EVENT_LOG_FILE", "events.jsonl")
+
+# Events are buffered in memory and written in one append per flush, so
+# timing a hot loop costs a dict and a list append
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "500"))
+EVENT_FLUSH_SECONDS = float(os.getenv("EVENT_FLUSH_SECONDS", "5"))
+
+
+class EventLog:
+    def __init__(self, path, buffer_size=500, flush_seconds=5.0):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.counters = {}
+        self.run_id = None
+        self.script = None
+        self.started = None
+
+    # Begin a run; EVENT_RUN_ID lets a wrapper tie several scripts together
+    def start_run(self, script, **fields):
+        self.run_id = os.getenv("EVENT_RUN_ID") or uuid.uuid4().hex[:12]
+        self.script = script
+        self.started = time.perf_counter()
+        with self.lock:
+            self.counters = {}
+        self.emit("run_start", host=socket.gethostname(), pid=os.getpid(), **fields)
+        return self.run_id
+
+    def emit(self, event, **fields):
+        if not self.path:
+            return
+        record = {
+            "ts": round(time.time(), 3),
+            "run": self.run_id,
+            "script": self.script,
+            "event": event,
+        }
+        record.update(fields)
+        with self.lock:
+            self.buffer.append(record)
+            due = (
+                len(self.buffer) >= self.buffer_size
+                or time.monotonic() - self.last_flush >= self.flush_seconds
+            )
+        if due:
+            self.flush()
+
+    # Time a block as one stage event. The yielded dict takes fields only
+    # known at the end (message counts and so on); a block that raises is
+    # recorded with ok=false and the exception type.
+    @contextmanager
+    def stage(self, name, **fields):
+        started = time.perf_counter()
+        ok = True
+        try:
+            yield fields
+        except BaseException as e:
+            ok = False
+            fields["error"] = type(e).__name__
+            raise
+        finally:
+            ms = round((time.perf_counter() - started) * 1000, 3)
+            self.emit("stage", stage=name, ms=ms, ok=ok, **fields)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def end_run(self, **fields):
+        if self.run_id is None:
+            return
+        with self.lock:
+            counters = dict(self.counters)
+        seconds = round(time.perf_counter() - self.started, 3)
+        self.emit("run_end", seconds=seconds, counters=counters, **fields)
+        self.flush()
+        self.run_id = None
+
+    def flush(self):
+        with self.lock:
+            records, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+        if not records:
+            return
+        data = "".join(
+            json.dumps(r, separators=(",", ":"), default=str) + "\n" for r in records
+        )
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+        except OSError as e:
+            # Instrumentation must never take the pipeline down with it
+            print(f"Could not write events to {self.path}: {e}")
+
+
+EVENTS = EventLog(EVENT_LOG_FILE, EVENT_BUFFER_SIZE, EVENT_FLUSH_SECONDS)
+atexit.register(EVENTS.flush)
+
+start_run = EVENTS.start_run
+emit = EVENTS.emit
+stage = EVENTS.stage
+count = EVENTS.count
+end_run = EVENTS.end_run
+flush = EVENTS.flush
+
+
+def read_events(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            # A partial line is the tail of a run still being written
+            if line.endswith("\n"):
+                yield json.loads(line)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def list_runs(path, limit):
+    runs = {}
+    for record in read_events(path):
+        if record["event"] == "run_start":
+            runs[record["run"]] = {"start": record, "end": None}
+        elif record["event"] == "run_end" and record["run"] in runs:
+            runs[record["run"]]["end"] = record
+
+    for run_id, run in list(runs.items())[-limit:]:
+        started = datetime.fromtimestamp(run["start"]["ts"])
+        end = run["end"]
+        status = f"{end['seconds']:.1f}s" if end else "unfinished"
+        script = run["start"]["script"]
+        print(f"{run_id}  {script:<10} {started:%Y-%m-%d %H:%M:%S}  {status}")
+
+
+# Latency breakdown of one run (the latest by default): per stage, how often
+# it ran, the time spent in it and its latency distribution
+def summarize(path, run_id=None):
+    if run_id is None:
+        for record in read_events(path):
+            if record["event"] == "run_start":
+                run_id = record["run"]
+    if run_id is None:
+        print(f"No runs found in {path}")
+        return False
+
+    start = end = None
+    stages = {}
+    failures = {}
+    for record in read_events(path):
+        if record["run"] != run_id:
+            continue
+        if record["event"] == "run_start":
+            start = record
+        elif record["event"] == "run_end":
+            end = record
+        elif record["event"] == "stage":
+            stages.setdefault(record["stage"], []).append(record["ms"])
+            if not record["ok"]:
+                failures[record["stage"]] = failures.get(record["stage"], 0) + 1
+
+    if start is None:
+        print(f"Run {run_id} not found in {path}")
+        return False
+
+    started = datetime.fromtimestamp(start["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+    seconds = end["seconds"] if end else None
+    duration = f"{seconds:.1f}s" if end else "unfinished"
+    print(f"📊 Run {run_id} ({start['script']}) started {started}, {duration}")
+    print()
+    print(
+        f"{'stage':<16}{'count':>8}{'failed':>8}{'total s':>10}{'% of run':>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    for name, values in sorted(stages.items(), key=lambda s: -sum(s[1])):
+        total = sum(values) / 1000
+        share = f"{total / seconds:.1%}" if seconds else "-"
+        print(
+            f"{name:<16}{len(values):>8}{failures.get(name, 0):>8}{total:>10.2f}"
+            f"{share:>10}{percentile(values, 0.5):>10.1f}"
+            f"{percentile(values, 0.99):>10.1f}{max(values):>10.1f}"
+        )
+    print("(stages run in parallel threads can add up to more than 100%)")
+
+    if end and end.get("counters"):
+        print()
+        print("Counters:")
+        for name, value in sorted(end["counters"].items()):
+            print(f"- {name}: {value}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the structured event log")
+    parser.add_argument("--file", default=EVENT_LOG_FILE or "events.jsonl")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    runs = commands.add_parser("runs", help="list recent runs")
+    runs.add_argument("--limit", type=int, default=20)
+
+    summary = commands.add_parser("summarize", help="latency breakdown of a run")
+    summary.add_argument("run_id", nargs="?", help="defaults to the latest run")
+
+    args = parser.parse_args()
+    if not os.path.exists(args.file):
+        parser.error(f"{args.file} not found")
+
+    if args.command == "runs":
+        list_runs(args.file, args.limit)
+    elif not summarize(args.file, args.run_id):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
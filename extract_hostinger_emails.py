@@ -1,7 +1,5 @@
 import imaplib
-import email
 import re
-import psycopg2
 from dotenv import load_dotenv
 import os
 from datetime import datetime, timedelta
@@ -11,6 +9,18 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 import csv
+import io
+from address_extractor import extract_addresses
+import canonical
+import db
+import events
+import known_cache
+from domain_classifier import get_classifier, ROLE, DROPPED_CATEGORIES, PERSONAL, BUSINESS
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 def log_message(message):
     timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
@@ -27,132 +37,645 @@ SMTP_SERVER = os.getenv('SMTP_SERVER')
 SMTP_PORT = int(os.getenv('SMTP_PORT'))
 REPORT_RECIPIENT = os.getenv('REPORT_RECIPIENT')
 
-# PostgreSQL credentials
-DB_HOST = os.getenv('DB_HOST')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-
-# Define personal email domains
-PERSONAL_DOMAINS = ['gmail.com', 'outlook.com', 'yahoo.com', 'live.com']
-
-# Date filter (last 14 days)
-DATE_FILTER = (datetime.now() - timedelta(days=14)).strftime('%d-%b-%Y')
+# Connection options; plain IMAP / no STARTTLS are only meant for local
+# stand-in servers such as the ones in benchmarks/
+IMAP_SSL = os.getenv('IMAP_SSL', 'TRUE').upper() == 'TRUE'
+IMAP_PORT = int(os.getenv('IMAP_PORT', '993' if IMAP_SSL else '143'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'TRUE').upper() == 'TRUE'
+
+# PostgreSQL connections come from the shared pool in db.py
+DB_NAME = db.DB_NAME
+
+# Personal (freemail), disposable, denylist and role-account rules are loaded
+# from data/domains, see domain_classifier.py
+
+# Mailboxes to extract addresses from
+MAILBOXES = [m.strip() for m in os.getenv('MAILBOXES', 'INBOX,INBOX.Sent').split(',') if m.strip()]
+
+# Sync mode: 'incremental' fetches only UIDs above the saved checkpoint,
+# 'backfill' re-scans the date window (checkpoints are still advanced)
+SYNC_MODE = os.getenv('SYNC_MODE', 'incremental').lower()
+SYNC_STATE_FILE = os.getenv('SYNC_STATE_FILE', 'imap_sync_state.json')
+BACKFILL_DAYS = int(os.getenv('BACKFILL_DAYS', '14'))
+
+# Number of UIDs requested per FETCH command
+FETCH_BATCH_SIZE = int(os.getenv('FETCH_BATCH_SIZE', '500'))
+
+# Only the address headers are downloaded; BODY.PEEK leaves \Seen untouched
+ADDRESS_HEADERS = ['From', 'To', 'Cc', 'Bcc', 'Reply-To']
+HEADER_FETCH_ITEMS = f"(UID BODY.PEEK[HEADER.FIELDS ({' '.join(h.upper() for h in ADDRESS_HEADERS)})])"
+UID_RE = re.compile(rb'UID (\d+)')
+
+# Parallel extraction: number of IMAP worker connections, the hard cap the
+# server allows per account (the planning connection included, so at least
+# 2), and how many UIDs each worker task handles
+IMAP_WORKERS = int(os.getenv('IMAP_WORKERS', '1'))
+IMAP_MAX_CONNECTIONS = int(os.getenv('IMAP_MAX_CONNECTIONS', '4'))
+IMAP_RANGE_SIZE = int(os.getenv('IMAP_RANGE_SIZE', '5000'))
+
+# Streaming pipeline: bounded queue sizes (in FETCH batches), number of
+# parser threads, and how often the DB writer commits a chunk
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '8'))
+PARSER_THREADS = int(os.getenv('PARSER_THREADS', '2'))
+DB_CHUNK_SIZE = int(os.getenv('DB_CHUNK_SIZE', '2000'))
+DB_FLUSH_SECONDS = float(os.getenv('DB_FLUSH_SECONDS', '30'))
+
+# Multi-account mode: JSON list of accounts, each with "name", "email",
+# "imap_server", "password_env" (or "password") and optional "mailboxes",
+# "imap_workers" and "imap_max_connections". Without it the single account
+# from the environment is used.
+ACCOUNTS_FILE = os.getenv('ACCOUNTS_FILE')
+ACCOUNT_CONCURRENCY = int(os.getenv('ACCOUNT_CONCURRENCY', '4'))
+
+# Date filter (last 14 days) - used for backfill and when a mailbox has no valid checkpoint
+DATE_FILTER = (datetime.now() - timedelta(days=BACKFILL_DAYS)).strftime('%d-%b-%Y')
+
+# Counters kept for the whole run and, in the same shape, for each account
+def new_counters():
+    return {
+        'inbox_emails': 0,
+        'sent_emails': 0,
+        'total_emails': 0,
+        'personal_emails': 0,
+        'business_emails': 0,
+        'new_personal_emails': 0,
+        'new_business_emails': 0,
+        'mailboxes': {},
+        'workers': {},
+        'failed_batches': 0,
+        'role_emails': 0,
+        'filtered_emails': 0
+    }
 
 # Global counters for report
-report_data = {
-    'inbox_emails': 0,
-    'sent_emails': 0,
-    'total_emails': 0,
-    'personal_emails': 0,
-    'business_emails': 0,
-    'new_personal_emails': 0,
-    'new_business_emails': 0
-}
+report_data = new_counters()
+report_data['accounts'] = {}
+REPORT_LOCK = threading.Lock()
+SYNC_STATE_LOCK = threading.Lock()
 
 # Storage for newly processed emails (for CSV)
 new_personal_emails = set()
 new_business_emails = set()
 
-def extract_email_addresses(msg):
-    emails = set()
-    for header in ['From', 'To', 'Cc', 'Bcc']:
-        raw = msg.get(header)
-        if raw:
-            parts = raw.split(',')
-            for part in parts:
-                match = re.search(r'[\w\.-]+@[\w\.-]+\.[\w]{2,}', part)
-                if match:
-                    emails.add(match.group(0).strip().lower())
-    return emails
-
-def process_mailbox(mail, mailbox_name):
-    log_message(f"Processing mailbox: {mailbox_name} since {DATE_FILTER}")
-    mail.select(mailbox_name)
-
-    # Search emails from the last 14 days
-    typ, data = mail.search(None, f'(SINCE {DATE_FILTER})')
-    email_ids = data[0].split()
-    log_message(f"Found {len(email_ids)} emails in {mailbox_name} since {DATE_FILTER}")
+# Addresses from a raw header block (bytes), see address_extractor. Spelling
+# variants of one mailbox (see canonical) are collapsed to the first seen.
+def extract_email_addresses(raw_headers):
+    return set(canonical.dedupe(extract_addresses(raw_headers)).values())
+
+# Addresses whose canonical key is not in seen yet; seen is updated in place
+def unseen_addresses(emails, seen):
+    fresh = canonical.dedupe(emails, seen)
+    seen.update(fresh)
+    return set(fresh.values())
 
+def load_sync_state():
+    if not os.path.exists(SYNC_STATE_FILE):
+        return {}
+    try:
+        with open(SYNC_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        log_message(f"Could not read sync state {SYNC_STATE_FILE}, doing a full resync: {e}")
+        return {}
+
+def save_sync_state(state):
+    # Write to a temp file and rename so a crash never leaves a truncated checkpoint
+    tmp_file = f"{SYNC_STATE_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, SYNC_STATE_FILE)
+
+# Merge an account's new checkpoints into the shared state and persist it
+def commit_checkpoints(sync_state, account_state, checkpoints):
+    with SYNC_STATE_LOCK:
+        account_state.update(checkpoints)
+        save_sync_state(sync_state)
+
+# The planning connection stays open while the workers fetch, so an account
+# needs room for it plus at least one worker
+def check_connection_limit(name, max_connections):
+    if max_connections < 2:
+        raise ValueError(f"imap_max_connections for account {name} is {max_connections}, "
+                         f"at least 2 are needed (planning plus one worker)")
+
+def load_accounts():
+    if not ACCOUNTS_FILE:
+        check_connection_limit(EMAIL_ACCOUNT, IMAP_MAX_CONNECTIONS)
+        return [{
+            'name': EMAIL_ACCOUNT,
+            'email': EMAIL_ACCOUNT,
+            'imap_server': IMAP_SERVER,
+            'password': EMAIL_PASSWORD,
+            'mailboxes': MAILBOXES,
+        }]
+
+    with open(ACCOUNTS_FILE, 'r') as f:
+        accounts = json.load(f)
+
+    for account in accounts:
+        account.setdefault('name', account['email'])
+        account.setdefault('imap_server', IMAP_SERVER)
+        account.setdefault('mailboxes', MAILBOXES)
+        if 'password_env' in account:
+            account['password'] = os.getenv(account['password_env'])
+        if not account.get('password'):
+            raise ValueError(f"No password configured for account {account['name']}")
+        check_connection_limit(account['name'],
+                               account.get('imap_max_connections', IMAP_MAX_CONNECTIONS))
+    return accounts
+
+def _untagged_int(mail, name):
+    typ, data = mail.response(name)
+    if data and data[0] is not None:
+        try:
+            return int(data[0])
+        except (TypeError, ValueError):
+            return None
+    return None
+
+# Select a mailbox and work out which UIDs still need processing.
+# Returns (uids, new_checkpoint); the caller persists the checkpoint only
+# once the extracted addresses have been saved.
+def plan_mailbox(mail, mailbox_name, checkpoint):
+    typ, data = mail.select(f'"{mailbox_name}"', readonly=True)
+    if typ != 'OK':
+        raise RuntimeError(f"Could not select mailbox {mailbox_name}: {data}")
+
+    uidvalidity = _untagged_int(mail, 'UIDVALIDITY')
+    uidnext = _untagged_int(mail, 'UIDNEXT')
+
+    last_uid = 0
+    resync = False
+    if checkpoint and checkpoint.get('uidvalidity') == uidvalidity:
+        last_uid = int(checkpoint.get('last_uid', 0))
+    elif checkpoint:
+        log_message(f"UIDVALIDITY changed for {mailbox_name} "
+                    f"({checkpoint.get('uidvalidity')} -> {uidvalidity}), doing a full resync")
+        resync = True
+
+    # Renumbered UIDs say nothing about what was already read, so the whole
+    # mailbox is scanned, not just the backfill window
+    if resync:
+        log_message(f"Searching all of {mailbox_name}")
+        typ, data = mail.uid('search', None, 'ALL')
+    elif SYNC_MODE == 'backfill' or last_uid == 0:
+        log_message(f"Searching {mailbox_name} since {DATE_FILTER}")
+        typ, data = mail.uid('search', None, f'(SINCE {DATE_FILTER})')
+    else:
+        log_message(f"Searching {mailbox_name} for UIDs above {last_uid}")
+        typ, data = mail.uid('search', None, f'(UID {last_uid + 1}:*)')
+
+    # "UID n:*" always matches the highest UID, even if it is below n
+    uids = sorted(int(u) for u in data[0].split() if int(u) > last_uid or SYNC_MODE == 'backfill')
+
+    highest = max([last_uid] + uids)
+    if uidnext:
+        highest = max(highest, uidnext - 1)
+
+    return uids, {'uidvalidity': uidvalidity, 'last_uid': highest}
+
+# Compress sorted UIDs into an IMAP message set, e.g. [1, 2, 3, 7] -> "1:3,7"
+def uid_message_set(uids):
+    ranges = []
+    start = prev = uids[0]
+    for uid in uids[1:]:
+        if uid == prev + 1:
+            prev = uid
+            continue
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = uid
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ','.join(ranges)
+
+# Fetch the address headers for one batch of UIDs, returning a list of
+# (uid, raw_header_bytes) for every message returned by the server
+def fetch_header_batch(mail, batch):
+    typ, data = mail.uid('fetch', uid_message_set(batch), HEADER_FETCH_ITEMS)
+    if typ != 'OK':
+        raise RuntimeError(f"FETCH failed for {len(batch)} UIDs starting at {batch[0]}: {data}")
+
+    headers = []
+    for i, item in enumerate(data):
+        if not isinstance(item, tuple):
+            continue
+        match = UID_RE.search(item[0])
+        # Some servers send the UID after the literal, in the closing part
+        if not match and i + 1 < len(data) and isinstance(data[i + 1], bytes):
+            match = UID_RE.search(data[i + 1])
+        if match:
+            headers.append((int(match.group(1)), item[1]))
+    return headers
+
+def connect_imap(account):
+    imap_class = imaplib.IMAP4_SSL if IMAP_SSL else imaplib.IMAP4
+    mail = imap_class(account['imap_server'], IMAP_PORT)
+    mail.login(account['email'], account['password'])
+    return mail
+
+def record_mailbox_count(counters, mailbox_name, count):
     if mailbox_name == "INBOX":
-        report_data['inbox_emails'] = len(email_ids)
+        counters['inbox_emails'] = count
     elif mailbox_name == "INBOX.Sent":
-        report_data['sent_emails'] = len(email_ids)
-
-    all_emails = set()
-
-    for i, eid in enumerate(email_ids, 1):
-        typ, msg_data = mail.fetch(eid, '(RFC822)')
-        raw_email = msg_data[0][1]
-        msg = email.message_from_bytes(raw_email)
-
-        extracted = extract_email_addresses(msg)
-        all_emails.update(extracted)
-
-        if i % 100 == 0 or i == len(email_ids):
-            log_message(f"Processed {i}/{len(email_ids)} emails in {mailbox_name}...")
-
-    return all_emails
-
-def save_to_postgres(emails):
-    log_message("Connecting to PostgreSQL...")
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS
-    )
-    cursor = conn.cursor()
-
-    personal_emails = set()
-    business_emails = set()
+        counters['sent_emails'] = count
+    counters['mailboxes'][mailbox_name] = count
+    with REPORT_LOCK:
+        if mailbox_name == "INBOX":
+            report_data['inbox_emails'] += count
+        elif mailbox_name == "INBOX.Sent":
+            report_data['sent_emails'] += count
+
+# A FETCH or parse batch that failed is left uncommitted and retried next run;
+# counted for the account and the whole run under REPORT_LOCK
+def record_failed_batch(counters):
+    events.count('failed_batches')
+    with REPORT_LOCK:
+        counters['failed_batches'] += 1
+        report_data['failed_batches'] += 1
+
+# Tracks which FETCH batches of each mailbox have been committed to the
+# database and turns the contiguous committed prefix into a checkpoint
+class CheckpointTracker:
+    def __init__(self, account_state):
+        self.account_state = account_state
+        self.mailboxes = {}
+        self.lock = threading.Lock()
+
+    def add_mailbox(self, mailbox_name, batches, final_checkpoint):
+        self.mailboxes[mailbox_name] = {
+            'max_uids': [batch[-1] for batch in batches],
+            'committed': set(),
+            'next': 0,
+            'final': final_checkpoint,
+        }
+
+    def commit(self, mailbox_name, seq):
+        with self.lock:
+            tracked = self.mailboxes[mailbox_name]
+            tracked['committed'].add(seq)
+            while tracked['next'] in tracked['committed']:
+                tracked['committed'].discard(tracked['next'])
+                tracked['next'] += 1
+
+    def checkpoints(self):
+        with self.lock:
+            result = {}
+            for mailbox_name, tracked in self.mailboxes.items():
+                previous = self.account_state.get(mailbox_name)
+                if tracked['next'] == len(tracked['max_uids']):
+                    result[mailbox_name] = tracked['final']
+                elif tracked['next'] > 0:
+                    last_uid = tracked['max_uids'][tracked['next'] - 1]
+                    if previous and previous.get('uidvalidity') == tracked['final']['uidvalidity']:
+                        last_uid = max(last_uid, int(previous.get('last_uid', 0)))
+                    result[mailbox_name] = {'uidvalidity': tracked['final']['uidvalidity'], 'last_uid': last_uid}
+                elif previous:
+                    result[mailbox_name] = previous
+            return result
+
+# Holds one IMAP connection per worker thread, selected on one mailbox at a time
+class ImapWorkerPool:
+    def __init__(self, account, counters):
+        self.account = account
+        self.counters = counters
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def _connection(self, mailbox_name):
+        mail = getattr(self.local, 'mail', None)
+        if mail is None:
+            with events.stage('imap_connect', account=self.account['name']):
+                mail = connect_imap(self.account)
+            self.local.mail = mail
+            self.local.mailbox = None
+            with self.lock:
+                self.connections.append(mail)
+        if self.local.mailbox != mailbox_name:
+            mail.select(f'"{mailbox_name}"', readonly=True)
+            self.local.mailbox = mailbox_name
+        return mail
+
+    # Fetch a run of batches of one mailbox and push them onto the raw queue
+    def run(self, mailbox_name, batches, out_queue, abort):
+        worker = threading.current_thread().name
+        mail = self._connection(mailbox_name)
+
+        for seq, batch in batches:
+            if abort.is_set():
+                return
+            started = time.monotonic()
+            try:
+                with events.stage('imap_fetch', mailbox=mailbox_name, uids=len(batch)) as event:
+                    headers = fetch_header_batch(mail, batch)
+                    event['messages'] = len(headers)
+            except Exception as e:
+                # The batch is never committed, so the checkpoint stays below it
+                log_message(f"{worker}: {e}")
+                record_failed_batch(self.counters)
+                continue
+            elapsed = time.monotonic() - started
+            events.count('messages', len(headers))
+
+            with self.lock:
+                stats = self.counters['workers'].setdefault(worker, {'messages': 0, 'seconds': 0.0})
+                stats['messages'] += len(headers)
+                stats['seconds'] += elapsed
+
+            put_until_aborted(out_queue, (mailbox_name, seq, headers), abort)
+
+    def close(self):
+        for mail in self.connections:
+            try:
+                mail.logout()
+            except Exception as e:
+                log_message(f"Error closing IMAP worker connection: {e}")
+
+# Blocking put that gives up once the pipeline has been aborted, so a failed
+# stage can never leave the others stuck on a full queue
+def put_until_aborted(q, item, abort):
+    while not abort.is_set():
+        try:
+            q.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+# Parser stage: raw header batches in, classified address batches out. The
+# end-of-stream None may never arrive once the pipeline is aborted, so the
+# queue is polled and the abort flag checked in between.
+def parse_stage(raw_queue, address_queue, abort, counters):
+    while True:
+        try:
+            item = raw_queue.get(timeout=1)
+        except queue.Empty:
+            if abort.is_set():
+                return
+            continue
+        if item is None:
+            put_until_aborted(address_queue, None, abort)
+            return
+        mailbox_name, seq, headers = item
+        try:
+            with events.stage('parse', mailbox=mailbox_name, messages=len(headers)) as event:
+                emails = set()
+                for uid, raw_headers in headers:
+                    emails.update(extract_email_addresses(raw_headers))
+                personal_emails, business_emails, filtered = classify_emails(emails)
+                event['addresses'] = len(emails)
+        except Exception as e:
+            # Left uncommitted, so the batch is retried on the next run
+            log_message(f"Failed to parse batch {seq} of {mailbox_name}: {e}")
+            record_failed_batch(counters)
+            continue
+        put_until_aborted(address_queue, (mailbox_name, seq, personal_emails, business_emails, filtered), abort)
+
+# Streaming extract -> classify -> store pipeline. Memory is bounded by the
+# queue sizes and the set of canonical keys seen; every committed DB chunk
+# also advances the sync checkpoints, so a crash only loses the current chunk.
+def run_pipeline(mail, account, sync_state, account_state, counters):
+    tracker = CheckpointTracker(account_state)
+    tasks = []
+    for mailbox_name in account['mailboxes']:
+        uids, final_checkpoint = plan_mailbox(mail, mailbox_name, account_state.get(mailbox_name))
+        log_message(f"Found {len(uids)} emails to process in {mailbox_name}")
+        record_mailbox_count(counters, mailbox_name, len(uids))
+
+        batches = [uids[i:i + FETCH_BATCH_SIZE] for i in range(0, len(uids), FETCH_BATCH_SIZE)]
+        tracker.add_mailbox(mailbox_name, batches, final_checkpoint)
+        batches_per_task = max(1, IMAP_RANGE_SIZE // FETCH_BATCH_SIZE)
+        numbered = list(enumerate(batches))
+        for i in range(0, len(numbered), batches_per_task):
+            tasks.append((mailbox_name, numbered[i:i + batches_per_task]))
+
+    # The planning connection counts towards the server's connection limit
+    imap_workers = account.get('imap_workers', IMAP_WORKERS)
+    max_connections = account.get('imap_max_connections', IMAP_MAX_CONNECTIONS)
+    workers = max(1, min(imap_workers, max_connections - 1, len(tasks) or 1))
+    log_message(f"Extracting {len(tasks)} UID ranges with {workers} IMAP workers "
+                f"and {PARSER_THREADS} parser threads...")
+
+    raw_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    address_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    abort = threading.Event()
+    pool = ImapWorkerPool(account, counters)
+
+    parsers = [
+        threading.Thread(target=parse_stage, args=(raw_queue, address_queue, abort, counters),
+                         name=f"{account['name']}-parser-{i}", daemon=True)
+        for i in range(PARSER_THREADS)
+    ]
+    for parser in parsers:
+        parser.start()
+
+    def fetch_all():
+        try:
+            with ThreadPoolExecutor(max_workers=workers,
+                                    thread_name_prefix=f"{account['name']}-imap-worker") as executor:
+                futures = [executor.submit(pool.run, mailbox_name, batches, raw_queue, abort)
+                           for mailbox_name, batches in tasks]
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        log_message(f"IMAP worker failed: {e}")
+        finally:
+            pool.close()
+            for _ in parsers:
+                put_until_aborted(raw_queue, None, abort)
+
+    fetcher = threading.Thread(target=fetch_all, name=f"{account['name']}-imap-fetcher", daemon=True)
+    fetcher.start()
+
+    # DB writer stage runs on the account's thread
+    seen = set()
+    pending_personal, pending_business, pending_batches = set(), set(), []
+    last_flush = time.monotonic()
+    finished_parsers = 0
+
+    def flush():
+        insert_emails(pending_personal, pending_business, counters)
+        for mailbox_name, seq in pending_batches:
+            tracker.commit(mailbox_name, seq)
+        commit_checkpoints(sync_state, account_state, tracker.checkpoints())
+        pending_personal.clear()
+        pending_business.clear()
+        pending_batches.clear()
 
-    for email_address in emails:
-        domain = email_address.split('@')[-1]
-        if domain in PERSONAL_DOMAINS:
-            personal_emails.add(email_address)
+    try:
+        while finished_parsers < len(parsers):
+            try:
+                item = address_queue.get(timeout=1)
+            except queue.Empty:
+                item = False
+            if item is None:
+                finished_parsers += 1
+            elif item:
+                mailbox_name, seq, personal_emails, business_emails, filtered = item
+                record_filtered(counters, filtered)
+                pending_personal.update(unseen_addresses(personal_emails, seen))
+                pending_business.update(unseen_addresses(business_emails, seen))
+                pending_batches.append((mailbox_name, seq))
+
+            pending = len(pending_personal) + len(pending_business)
+            if pending_batches and (pending >= DB_CHUNK_SIZE or time.monotonic() - last_flush >= DB_FLUSH_SECONDS):
+                flush()
+                last_flush = time.monotonic()
+
+        if pending_batches:
+            flush()
         else:
-            business_emails.add(email_address)
-
-    report_data['personal_emails'] = len(personal_emails)
-    report_data['business_emails'] = len(business_emails)
-    report_data['total_emails'] = len(emails)
-
-    # Insert personal emails
-    for email_address in personal_emails:
+            # Nothing new arrived, but mailboxes without pending UIDs still move forward
+            commit_checkpoints(sync_state, account_state, tracker.checkpoints())
+    except Exception:
+        abort.set()
+        raise
+    finally:
+        fetcher.join()
+
+    for worker, stats in sorted(counters['workers'].items()):
+        rate = stats['messages'] / stats['seconds'] if stats['seconds'] else 0
+        log_message(f"{worker}: {stats['messages']} emails in {stats['seconds']:.1f}s ({rate:.0f} emails/sec)")
+
+# Split addresses into personal and business sets. Role accounts are kept as
+# business; disposable and denylisted addresses are dropped and returned as
+# {category: count} for the report.
+def classify_emails(emails):
+    batch = get_classifier().classify_batch(emails)
+    personal_emails = batch[PERSONAL]
+    business_emails = batch[BUSINESS] | batch[ROLE]
+    filtered = {category: len(batch[category]) for category in [ROLE] + sorted(DROPPED_CATEGORIES)}
+    return personal_emails, business_emails, filtered
+
+def record_filtered(counters, filtered):
+    dropped = sum(count for category, count in filtered.items() if category in DROPPED_CATEGORIES)
+    with REPORT_LOCK:
+        for target in [report_data, counters] if counters is not None else [report_data]:
+            target['role_emails'] += filtered[ROLE]
+            target['filtered_emails'] += dropped
+
+def save_to_postgres(emails, counters=None):
+    personal_emails, business_emails, filtered = classify_emails(emails)
+    record_filtered(counters, filtered)
+    insert_emails(personal_emails, business_emails, counters)
+
+# Addresses longer than this or containing control characters / backslashes
+# are rejected before the COPY so they cannot break the staging load
+MAX_EMAIL_LENGTH = 254
+BAD_EMAIL_CHARS = re.compile(r'[\x00-\x1f\x7f\\]')
+
+# Per-row fallback used when the set-based insert fails; each row gets its own
+# savepoint so one bad address only skips itself. emails is {canonical_key: address}.
+# Returns the newly inserted addresses and every address that is now stored.
+def insert_rows_individually(cursor, table, emails):
+    inserted, stored = set(), set()
+    for key, email_address in emails.items():
+        cursor.execute("SAVEPOINT email_row;")
         try:
             cursor.execute(
-                "INSERT INTO personal_emails (email) VALUES (%s) ON CONFLICT (email) DO NOTHING RETURNING email;",
-                (email_address,)
+                f"INSERT INTO {table} (email, canonical_key) SELECT %s, %s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE canonical_key = %s) "
+                f"ON CONFLICT (email) DO NOTHING RETURNING email;",
+                (email_address, key, key)
             )
-            result = cursor.fetchone()
-            if result:
-                new_personal_emails.add(email_address)
+            if cursor.fetchone():
+                inserted.add(email_address)
+            cursor.execute("RELEASE SAVEPOINT email_row;")
+            stored.add(email_address)
         except Exception as e:
-            log_message(f"Error inserting personal email {email_address}: {e}")
+            cursor.execute("ROLLBACK TO SAVEPOINT email_row;")
+            log_message(f"Error inserting {table} row {email_address}: {e}")
+    return inserted, stored
+
+# Stream both categories into a temporary staging table with COPY, then move
+# them into personal_emails / business_emails with one INSERT ... SELECT each.
+# An address is skipped when any spelling of it (same canonical_key) is
+# already stored. Returns the sets of newly inserted addresses, and the set of
+# addresses the database now holds (inserted or already there); malformed rows
+# and rows that failed to insert are in neither.
+def bulk_insert_emails(cursor, personal_emails, business_emails):
+    buffer = io.StringIO()
+    rows = {'personal': {}, 'business': {}}
+    for category, emails in (('personal', personal_emails), ('business', business_emails)):
+        for key, email_address in canonical.dedupe(emails).items():
+            if len(email_address) > MAX_EMAIL_LENGTH or BAD_EMAIL_CHARS.search(email_address):
+                log_message(f"Skipping malformed email {email_address!r}")
+                continue
+            rows[category][key] = email_address
+            buffer.write(f"{email_address}\t{category}\t{key}\n")
+    buffer.seek(0)
+
+    cursor.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS email_staging (email text, category text, canonical_key text) "
+        "ON COMMIT DELETE ROWS;"
+    )
+    cursor.copy_from(buffer, 'email_staging', columns=('email', 'category', 'canonical_key'))
 
-    # Insert business emails
-    for email_address in business_emails:
+    inserted = {}
+    stored = set()
+    for category, table in (('personal', 'personal_emails'), ('business', 'business_emails')):
+        cursor.execute("SAVEPOINT email_bulk;")
         try:
             cursor.execute(
-                "INSERT INTO business_emails (email) VALUES (%s) ON CONFLICT (email) DO NOTHING RETURNING email;",
-                (email_address,)
+                f"INSERT INTO {table} (email, canonical_key) "
+                f"SELECT s.email, s.canonical_key FROM email_staging s "
+                f"WHERE s.category = %s "
+                f"AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.canonical_key = s.canonical_key) "
+                f"ON CONFLICT (email) DO NOTHING RETURNING email;",
+                (category,)
             )
-            result = cursor.fetchone()
-            if result:
-                new_business_emails.add(email_address)
+            inserted[category] = {row[0] for row in cursor.fetchall()}
+            cursor.execute("RELEASE SAVEPOINT email_bulk;")
+            stored.update(rows[category].values())
         except Exception as e:
-            log_message(f"Error inserting business email {email_address}: {e}")
-
-    conn.commit()
-    cursor.close()
-    conn.close()
-    log_message("Emails saved to PostgreSQL successfully!")
+            cursor.execute("ROLLBACK TO SAVEPOINT email_bulk;")
+            log_message(f"Bulk insert into {table} failed, falling back to row by row: {e}")
+            inserted[category], stored_rows = insert_rows_individually(cursor, table, rows[category])
+            stored |= stored_rows
+
+    return inserted['personal'], inserted['business'], stored
+
+# Insert one chunk of classified addresses; counters accumulate across chunks,
+# both for the whole run and for the account the chunk came from
+def insert_emails(personal_emails, business_emails, counters=None):
+    # Addresses already known to be stored never reach the database
+    cache = known_cache.get_cache()
+    to_insert_personal, to_insert_business = personal_emails, business_emails
+    if cache is not None:
+        to_insert_personal = cache.filter_unknown(personal_emails)
+        to_insert_business = cache.filter_unknown(business_emails)
+
+    inserted_personal, inserted_business = set(), set()
+    if to_insert_personal or to_insert_business:
+        rows = len(to_insert_personal) + len(to_insert_business)
+        with events.stage('db_write', rows=rows) as event:
+            with db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    inserted_personal, inserted_business, stored = bulk_insert_emails(
+                        cursor, to_insert_personal, to_insert_business
+                    )
+            event['inserted'] = len(inserted_personal) + len(inserted_business)
+        events.count('new_emails', len(inserted_personal) + len(inserted_business))
+        # Only what the committed batch actually holds, so a row that was
+        # rejected or failed is looked at again on the next run
+        if cache is not None:
+            cache.add(stored)
+    log_message(f"Saved {len(to_insert_personal) + len(to_insert_business)} of "
+                f"{len(personal_emails) + len(business_emails)} emails to PostgreSQL "
+                f"({len(inserted_personal)} new personal, {len(inserted_business)} new business)")
 
     # Update report data with new counts
-    report_data['new_personal_emails'] = len(new_personal_emails)
-    report_data['new_business_emails'] = len(new_business_emails)
+    with REPORT_LOCK:
+        new_personal_emails.update(inserted_personal)
+        new_business_emails.update(inserted_business)
+        for target in [report_data, counters] if counters is not None else [report_data]:
+            target['personal_emails'] += len(personal_emails)
+            target['business_emails'] += len(business_emails)
+            target['total_emails'] += len(personal_emails) + len(business_emails)
+            target['new_personal_emails'] += len(inserted_personal)
+            target['new_business_emails'] += len(inserted_business)
 
 def generate_csv(personal_emails, business_emails):
     filename = f"email_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
@@ -183,25 +706,56 @@ def send_report(csv_attachment):
             f"- Business emails: {report_data['new_business_emails']}"
         )
 
+    mailbox_lines = [
+        f"- {name}: {count} emails processed" for name, count in report_data['mailboxes'].items()
+    ]
+    worker_lines = []
+    for account_name, counters in report_data['accounts'].items():
+        mailbox_lines.append(
+            f"\n📬 {account_name}: {counters['new_personal_emails']} new personal, "
+            f"{counters['new_business_emails']} new business"
+        )
+        mailbox_lines.extend(
+            f"- {name}: {count} emails processed" for name, count in counters['mailboxes'].items()
+        )
+        if counters['failed_batches']:
+            mailbox_lines.append(f"- ⚠️ Failed batches (retried next run): {counters['failed_batches']}")
+        if counters.get('error'):
+            mailbox_lines.append(f"- ❌ Error: {counters['error']}")
+        worker_lines.extend(
+            f"- {worker}: {stats['messages']} emails in {stats['seconds']:.1f}s"
+            for worker, stats in sorted(counters['workers'].items())
+        )
+    mailbox_summary = "\n".join(mailbox_lines).strip("\n")
+
+    worker_summary = ""
+    if worker_lines:
+        worker_summary = "\n⚡ IMAP Workers:\n" + "\n".join(worker_lines) + "\n"
+
+    failed_accounts = [name for name, counters in report_data['accounts'].items() if counters.get('error')]
+    status = "Completed successfully!"
+    if failed_accounts:
+        status = f"Completed with errors in {len(failed_accounts)} account(s): {', '.join(failed_accounts)}"
+
     body = f"""
 ✅ Email extraction completed!
 
-📅 Date Filter: {DATE_FILTER} and newer
+📅 Sync Mode: {SYNC_MODE} (date window for new mailboxes: {DATE_FILTER} and newer, reset mailboxes rescanned in full)
 
 📨 Mailbox Summary:
-- Inbox emails processed: {report_data['inbox_emails']}
-- Sent emails processed: {report_data['sent_emails']}
+{mailbox_summary}
 
 📊 Extraction Summary:
 - Total unique emails extracted: {report_data['total_emails']}
 - Personal emails found: {report_data['personal_emails']}
-- Business emails found: {report_data['business_emails']}
+- Business emails found: {report_data['business_emails']} (role accounts: {report_data['role_emails']})
+- Disposable / denylisted emails skipped: {report_data['filtered_emails']}
 
 {new_email_summary}
-
+{worker_summary}
 🗂️ Database: {DB_NAME}
 
-✅ Status: Completed successfully!
+✅ Status: {status}
 """
 
     msg = MIMEMultipart()
@@ -224,33 +778,68 @@ def send_report(csv_attachment):
 
     try:
         with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
+            if SMTP_STARTTLS:
+                server.starttls()
             server.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
             server.send_message(msg)
         log_message("Report email sent successfully!")
     except Exception as e:
         log_message(f"Failed to send report email: {e}")
 
+# Run the whole pipeline for one account on its own IMAP connections
+def extract_account(account, sync_state):
+    counters = new_counters()
+    with REPORT_LOCK:
+        report_data['accounts'][account['name']] = counters
+
+    with SYNC_STATE_LOCK:
+        account_state = sync_state.setdefault(account['email'], {})
+
+    try:
+        log_message(f"Extracting account {account['name']}...")
+        with events.stage('imap_connect', account=account['name']):
+            mail = connect_imap(account)
+        try:
+            run_pipeline(mail, account, sync_state, account_state, counters)
+        finally:
+            mail.logout()
+        log_message(f"Account {account['name']} done")
+    except Exception as e:
+        # One failing account must not stop the others or the report
+        log_message(f"Extraction failed for account {account['name']}: {e}")
+        counters['error'] = str(e)
+
 def main():
-    log_message(f"Starting email extraction ({DATE_FILTER} and newer)...")
-    mail = imaplib.IMAP4_SSL(IMAP_SERVER)
-    mail.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
+    log_message(f"Starting email extraction ({SYNC_MODE} sync)...")
+    events.start_run('extract', sync_mode=SYNC_MODE)
+    try:
+        run_extraction()
+    finally:
+        events.end_run()
 
-    inbox_emails = process_mailbox(mail, "INBOX")
-    sent_emails = process_mailbox(mail, "INBOX.Sent")
+def run_extraction():
+    accounts = load_accounts()
+    sync_state = load_sync_state()
 
-    all_emails = inbox_emails.union(sent_emails)
+    with ThreadPoolExecutor(max_workers=max(1, min(ACCOUNT_CONCURRENCY, len(accounts))),
+                            thread_name_prefix='account') as executor:
+        list(executor.map(lambda account: extract_account(account, sync_state), accounts))
+    log_message(f"Sync checkpoints saved to {SYNC_STATE_FILE}")
 
-    save_to_postgres(all_emails)
+    cache = known_cache.get_cache()
+    if cache is not None:
+        cache.compact()
+        log_message(f"Known-address cache holds {len(cache)} addresses")
 
-    mail.logout()
     log_message("Email extraction completed!")
 
     # Generate CSV
-    csv_file = generate_csv(new_personal_emails, new_business_emails)
+    with events.stage('report_csv', rows=len(new_personal_emails) + len(new_business_emails)):
+        csv_file = generate_csv(new_personal_emails, new_business_emails)
 
     # Send report with CSV attachment
-    send_report(csv_file)
+    with events.stage('report_email'):
+        send_report(csv_file)
 
     # Auto-cleanup: remove CSV file after sending email
     try:
@@ -0,0 +1,34 @@
+import os
+
+bind = os.getenv("UNSUBSCRIBE_BIND", "0.0.0.0:5000")
+
+# A single process owns the unsubscribe journal, so concurrency comes from
+# threads; the handler only appends to the journal and returns a static page
+workers = 1
+worker_class = "gthread"
+threads = int(os.getenv("UNSUBSCRIBE_THREADS", "32"))
+backlog = 2048
+keepalive = 5
+graceful_timeout = 30
+
+
+# Start the journal once the worker is up rather than at import time. What
+# a previous process left in it is replayed in the background, retrying
+# until the database answers, so a worker boots and takes unsubscribes
+# during a database outage. On a reload the old worker still owns the
+# journal until worker_exit; the new one waits for it, telling the arbiter
+# it is alive meanwhile.
+def post_worker_init(worker):
+    from unsubscribe_app import UNSUBSCRIBE_LOG
+
+    UNSUBSCRIBE_LOG.start(background_replay=True, wait=True, heartbeat=worker.notify)
+
+
+# Write out whatever is still journaled before the worker goes away
+def worker_exit(server, worker):
+    from unsubscribe_app import UNSUBSCRIBE_LOG, UNSUBSCRIBE_JOURNAL_FILE
+
+    if not UNSUBSCRIBE_LOG.close():
+        print(
+            f"⚠️ Unflushed unsubscribes kept in {UNSUBSCRIBE_JOURNAL_FILE} for next start"
+        )
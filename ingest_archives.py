@@ -0,0 +1,234 @@
+import argparse
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from address_extractor import extract_addresses
+import extract_hostinger_emails as extractor
+from extract_hostinger_emails import log_message, report_data
+
+# Large mbox files are split into byte ranges of this size so one archive is
+# spread over the whole process pool
+MBOX_SPLIT_BYTES = int(os.getenv("MBOX_SPLIT_BYTES", str(64 * 1024 * 1024)))
+
+# Number of .eml / Maildir files handled per worker task
+FILES_PER_TASK = int(os.getenv("INGEST_FILES_PER_TASK", "500"))
+
+# Upper bound on how much of a message is searched for the end of its headers
+MAX_HEADER_BYTES = 256 * 1024
+
+# Tasks submitted ahead of the DB writer, to keep parent memory bounded
+MAX_IN_FLIGHT_FACTOR = 2
+
+MBOX_SEPARATOR = b"\nFrom "
+
+
+def _header_end(buf, start, limit):
+    end = buf.find(b"\n\n", start, limit)
+    crlf_end = buf.find(b"\r\n\r\n", start, limit)
+    if crlf_end != -1 and (end == -1 or crlf_end < end):
+        end = crlf_end
+    return limit if end == -1 else end
+
+
+# Scan one byte range of a memory-mapped mbox file. A message belongs to the
+# range its "From " separator line starts in.
+def scan_mbox_range(path, start, stop):
+    emails = set()
+    messages = 0
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            if start == 0 and mm[:5] == b"From ":
+                pos = 0
+            else:
+                pos = mm.find(MBOX_SEPARATOR, max(start - 1, 0))
+                pos = -1 if pos == -1 else pos + 1
+
+            while pos != -1 and pos < stop:
+                next_sep = mm.find(MBOX_SEPARATOR, pos)
+                message_end = size if next_sep == -1 else next_sep + 1
+
+                # Skip the "From sender date" separator line itself
+                header_start = mm.find(b"\n", pos, message_end)
+                if header_start != -1:
+                    header_start += 1
+                    limit = min(message_end, header_start + MAX_HEADER_BYTES)
+                    header_end = _header_end(mm, header_start, limit)
+                    emails.update(extract_addresses(mm[header_start:header_end]))
+                    messages += 1
+
+                pos = -1 if next_sep == -1 else next_sep + 1
+    return emails, messages
+
+
+def read_headers(path):
+    chunks = []
+    total = 0
+    with open(path, "rb") as f:
+        while total < MAX_HEADER_BYTES:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            total += len(chunk)
+            data = b"".join(chunks) if len(chunks) > 1 else chunk
+            if b"\n\n" in data or b"\r\n\r\n" in data:
+                break
+    data = b"".join(chunks)
+    return data[: _header_end(data, 0, len(data))]
+
+
+def scan_message_files(paths):
+    emails = set()
+    messages = 0
+    for path in paths:
+        try:
+            emails.update(extract_addresses(read_headers(path)))
+            messages += 1
+        except OSError as e:
+            log_message(f"Could not read {path}: {e}")
+    return emails, messages
+
+
+def is_mbox(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(5) == b"From "
+    except OSError:
+        return False
+
+
+# Walk the given paths and turn them into (label, function, args) tasks
+def discover_tasks(paths):
+    tasks = []
+    message_files = []
+
+    def add_mbox(path):
+        size = os.path.getsize(path)
+        for start in range(0, size, MBOX_SPLIT_BYTES):
+            stop = start + MBOX_SPLIT_BYTES
+            tasks.append((path, scan_mbox_range, (path, start, stop)))
+
+    for root_path in paths:
+        if os.path.isfile(root_path):
+            if root_path.endswith(".eml"):
+                message_files.append(root_path)
+            elif is_mbox(root_path):
+                add_mbox(root_path)
+            else:
+                log_message(f"Skipping {root_path}: not an mbox or .eml file")
+            continue
+
+        for dirpath, dirnames, filenames in os.walk(root_path):
+            # Maildir: messages live in cur/ and new/, tmp/ holds partial deliveries
+            parent = os.path.dirname(dirpath)
+            if os.path.basename(dirpath) == "tmp" and os.path.isdir(
+                os.path.join(parent, "cur")
+            ):
+                continue
+            in_maildir = os.path.basename(dirpath) in ("cur", "new")
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if in_maildir or filename.endswith(".eml"):
+                    message_files.append(path)
+                elif filename.endswith(".mbox") or is_mbox(path):
+                    add_mbox(path)
+
+    for i in range(0, len(message_files), FILES_PER_TASK):
+        batch = message_files[i : i + FILES_PER_TASK]
+        tasks.append((os.path.dirname(batch[0]), scan_message_files, (batch,)))
+
+    return tasks
+
+
+def ingest(paths, workers, chunk_size):
+    tasks = discover_tasks(paths)
+    log_message(f"Ingesting {len(tasks)} archive tasks with {workers} processes...")
+
+    seen = set()
+    pending = set()
+    total_messages = 0
+
+    def flush():
+        extractor.save_to_postgres(pending)
+        pending.clear()
+
+    max_in_flight = workers * MAX_IN_FLIGHT_FACTOR
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        queued = iter(tasks)
+        in_flight = {}
+        done_tasks = 0
+
+        def submit_next():
+            task = next(queued, None)
+            if task is not None:
+                label, func, args = task
+                in_flight[executor.submit(func, *args)] = label
+
+        for _ in range(max_in_flight):
+            submit_next()
+
+        while in_flight:
+            future = next(as_completed(in_flight))
+            label = in_flight.pop(future)
+            submit_next()
+            done_tasks += 1
+
+            try:
+                emails, messages = future.result()
+            except Exception as e:
+                log_message(f"Failed to ingest part of {label}: {e}")
+                continue
+
+            total_messages += messages
+            mailbox_key = os.path.basename(label.rstrip(os.sep)) or label
+            report_data["mailboxes"][mailbox_key] = (
+                report_data["mailboxes"].get(mailbox_key, 0) + messages
+            )
+            pending.update(extractor.unseen_addresses(emails, seen))
+
+            if len(pending) >= chunk_size:
+                flush()
+            log_message(
+                f"Processed {done_tasks}/{len(tasks)} tasks, "
+                f"{total_messages} messages..."
+            )
+
+    if pending:
+        flush()
+
+    log_message(
+        f"Archive ingestion completed: {total_messages} messages, "
+        f"{len(seen)} unique emails, "
+        f"{report_data['new_personal_emails']} new personal, "
+        f"{report_data['new_business_emails']} new business"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Extract addresses from mbox files, Maildir trees and .eml dirs"
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="mbox files, Maildir or .eml directories"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=extractor.DB_CHUNK_SIZE)
+    parser.add_argument(
+        "--send-report", action="store_true", help="email the usual report with CSV"
+    )
+    args = parser.parse_args()
+
+    ingest(args.paths, args.workers, args.chunk_size)
+
+    if args.send_report:
+        csv_file = extractor.generate_csv(
+            extractor.new_personal_emails, extractor.new_business_emails
+        )
+        extractor.send_report(csv_file)
+        os.remove(csv_file)
+
+
+if __name__ == "__main__":
+    main()
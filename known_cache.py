@@ -0,0 +1,232 @@
+import argparse
+import hashlib
+import heapq
+import os
+import threading
+from array import array
+from bisect import bisect_left
+
+import db
+from canonical import canonical_key
+
+# Addresses already stored in personal_emails / business_emails, kept on disk
+# as a sorted array of 64-bit hashes (8 bytes per address) plus an append-only
+# log of hashes added since the last compaction
+KNOWN_CACHE_FILE = os.getenv("KNOWN_CACHE_FILE", "known_addresses.cache")
+KNOWN_CACHE_ENABLED = os.getenv("KNOWN_CACHE", "TRUE").upper() == "TRUE"
+
+# Compact the log into the sorted array once it holds this many hashes
+COMPACT_THRESHOLD = int(os.getenv("KNOWN_CACHE_COMPACT_THRESHOLD", "100000"))
+
+MAGIC = b"KNOWNADR1"
+STREAM_BATCH_SIZE = 50_000
+SORT_RUN_SIZE = 1_000_000
+
+
+# Hashes the canonical key, so every spelling of a stored mailbox is known
+def address_hash(email_address):
+    key = canonical_key(email_address)
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _read_hashes(path, with_header):
+    hashes = array("Q")
+    if not os.path.exists(path):
+        return hashes
+    with open(path, "rb") as f:
+        if with_header and f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a known-address cache file")
+        data = f.read()
+    # A crash mid-append can leave a partial record at the end of the log
+    usable = len(data) - len(data) % hashes.itemsize
+    hashes.frombytes(data[:usable])
+    return hashes
+
+
+# Sort a stream of hashes in fixed-size runs merged at the end, so only one
+# run is ever held as Python ints; duplicates are dropped while merging
+def sorted_unique(values):
+    runs = []
+    run = []
+    for value in values:
+        run.append(value)
+        if len(run) >= SORT_RUN_SIZE:
+            run.sort()
+            runs.append(array("Q", run))
+            run = []
+    run.sort()
+    runs.append(array("Q", run))
+
+    result = array("Q")
+    previous = None
+    for value in heapq.merge(*runs):
+        if value != previous:
+            result.append(value)
+            previous = value
+    return result
+
+
+# False positives need a 64-bit hash collision, about 1 in 10^12 per lookup
+# at 10 million addresses; a colliding new address would only be skipped
+# until the next rebuild.
+class KnownAddressCache:
+    def __init__(self, path=KNOWN_CACHE_FILE):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.lock = threading.Lock()
+        self.sorted_hashes = _read_hashes(path, with_header=True)
+        self.recent = set()
+        # The log may repeat entries if a compaction was interrupted
+        for value in _read_hashes(self.log_path, with_header=False):
+            if not self._contains(value):
+                self.recent.add(value)
+
+    def __len__(self):
+        return len(self.sorted_hashes) + len(self.recent)
+
+    def _contains(self, value):
+        if value in self.recent:
+            return True
+        i = bisect_left(self.sorted_hashes, value)
+        return i < len(self.sorted_hashes) and self.sorted_hashes[i] == value
+
+    def filter_unknown(self, emails):
+        with self.lock:
+            return {e for e in emails if not self._contains(address_hash(e))}
+
+    # Record addresses once they are committed to the database, so the cache
+    # never claims an address the database does not hold
+    def add(self, emails):
+        with self.lock:
+            new = array("Q")
+            for email_address in emails:
+                value = address_hash(email_address)
+                if not self._contains(value):
+                    self.recent.add(value)
+                    new.append(value)
+            if new:
+                with open(self.log_path, "ab") as f:
+                    new.tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+            if len(self.recent) >= COMPACT_THRESHOLD:
+                self._compact()
+
+    def compact(self):
+        with self.lock:
+            self._compact()
+
+    def _compact(self):
+        # recent never overlaps sorted_hashes, see add()
+        merged = array("Q", heapq.merge(self.sorted_hashes, sorted(self.recent)))
+        self._write(merged)
+        self.sorted_hashes = merged
+        self.recent = set()
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+    def _write(self, hashes):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            hashes.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def replace_all(self, hashes):
+        with self.lock:
+            self.recent = set()
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self._write(hashes)
+            self.sorted_hashes = hashes
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Process-wide cache, or None when disabled with KNOWN_CACHE=false
+def get_cache():
+    global _cache
+    if not KNOWN_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = KnownAddressCache()
+    return _cache
+
+
+# Hash every stored address with a server-side cursor, so neither side of
+# the comparison ever holds the address strings in memory
+def database_hashes():
+    with db.get_connection() as conn:
+        with conn.cursor(name="known_cache_scan") as cursor:
+            cursor.itersize = STREAM_BATCH_SIZE
+            cursor.execute(
+                "SELECT email FROM personal_emails "
+                "UNION ALL SELECT email FROM business_emails;"
+            )
+            return sorted_unique(
+                address_hash(email_address) for (email_address,) in cursor
+            )
+
+
+def rebuild(cache):
+    hashes = database_hashes()
+    cache.replace_all(hashes)
+    print(f"✅ Known-address cache rebuilt with {len(hashes)} addresses.")
+
+
+# Compare the cache against the database: addresses missing from the cache
+# only cost extra DB work, extra cache entries hide addresses from the DB
+def check_drift(cache):
+    cache.compact()
+    cached = cache.sorted_hashes
+    stored = database_hashes()
+
+    missing = extra = 0
+    i = j = 0
+    while i < len(stored) or j < len(cached):
+        if j == len(cached) or (i < len(stored) and stored[i] < cached[j]):
+            missing += 1
+            i += 1
+        elif i == len(stored) or cached[j] < stored[i]:
+            extra += 1
+            j += 1
+        else:
+            i += 1
+            j += 1
+
+    print(f"Database addresses: {len(stored)}, cached: {len(cached)}")
+    print(f"Missing from cache: {missing}, in cache but not in database: {extra}")
+    return missing, extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the known-address cache")
+    parser.add_argument("command", choices=["rebuild", "check", "stats"])
+    parser.add_argument(
+        "--repair", action="store_true", help="rebuild the cache if check finds drift"
+    )
+    args = parser.parse_args()
+
+    cache = KnownAddressCache()
+    if args.command == "rebuild":
+        rebuild(cache)
+    elif args.command == "check":
+        missing, extra = check_drift(cache)
+        if (missing or extra) and args.repair:
+            rebuild(cache)
+    else:
+        size_mb = len(cache) * 8 / (1024 * 1024)
+        print(
+            f"{len(cache)} cached addresses ({len(cache.recent)} in the log), "
+            f"~{size_mb:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
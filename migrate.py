@@ -0,0 +1,65 @@
+import argparse
+import os
+
+import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def available_migrations():
+    return sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith(".sql"))
+
+
+def applied_migrations(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        """
+    )
+    cursor.execute("SELECT version FROM schema_migrations;")
+    return {row[0] for row in cursor.fetchall()}
+
+
+# Apply every pending migration in version order, each in its own transaction
+def migrate(dry_run=False):
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            applied = applied_migrations(cursor)
+
+    pending = [m for m in available_migrations() if m not in applied]
+    if not pending:
+        print("✅ Database schema is up to date.")
+        return
+
+    for migration in pending:
+        if dry_run:
+            print(f"Pending: {migration}")
+            continue
+
+        with open(os.path.join(MIGRATIONS_DIR, migration), "r") as f:
+            sql = f.read()
+
+        with db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version) VALUES (%s);",
+                    (migration,),
+                )
+        print(f"✅ Applied migration {migration}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    parser.add_argument(
+        "--status", action="store_true", help="list pending migrations only"
+    )
+    args = parser.parse_args()
+    migrate(dry_run=args.status)
+
+
+if __name__ == "__main__":
+    main()
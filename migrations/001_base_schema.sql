@@ -0,0 +1,32 @@
+-- Tables the extraction, sender and unsubscribe scripts assume. Existing
+-- installs already have them; IF NOT EXISTS keeps this migration a no-op
+-- there apart from the columns added below.
+
+CREATE TABLE IF NOT EXISTS personal_emails (
+    id BIGSERIAL PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS business_emails (
+    id BIGSERIAL PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS sent_emails (
+    email TEXT PRIMARY KEY,
+    sent_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS unsubscribe_emails (
+    email TEXT PRIMARY KEY,
+    unsubscribed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Older tables were created without a surrogate key; the id gives recipient
+-- selection a stable insertion order
+ALTER TABLE personal_emails ADD COLUMN IF NOT EXISTS id BIGSERIAL;
+ALTER TABLE business_emails ADD COLUMN IF NOT EXISTS id BIGSERIAL;
+CREATE UNIQUE INDEX IF NOT EXISTS personal_emails_id_idx ON personal_emails (id);
+CREATE UNIQUE INDEX IF NOT EXISTS business_emails_id_idx ON business_emails (id);
@@ -0,0 +1,80 @@
+-- Maintained set of addresses that may still be mailed: everything in
+-- personal_emails / business_emails that is neither sent nor unsubscribed.
+-- Picking the next batch is an index scan on (category, id) whose cost does
+-- not depend on the size of sent_emails or unsubscribe_emails.
+
+CREATE TABLE IF NOT EXISTS eligible_recipients (
+    id BIGSERIAL PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL CHECK (category IN ('personal', 'business')),
+    added_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS eligible_recipients_category_id_idx
+    ON eligible_recipients (category, id);
+
+-- Backfill with anti-joins, oldest addresses first
+INSERT INTO eligible_recipients (email, category)
+SELECT p.email, 'personal'
+FROM personal_emails p
+WHERE NOT EXISTS (SELECT 1 FROM sent_emails s WHERE s.email = p.email)
+  AND NOT EXISTS (SELECT 1 FROM unsubscribe_emails u WHERE u.email = p.email)
+ORDER BY p.id
+ON CONFLICT (email) DO NOTHING;
+
+INSERT INTO eligible_recipients (email, category)
+SELECT b.email, 'business'
+FROM business_emails b
+WHERE NOT EXISTS (SELECT 1 FROM sent_emails s WHERE s.email = b.email)
+  AND NOT EXISTS (SELECT 1 FROM unsubscribe_emails u WHERE u.email = b.email)
+ORDER BY b.id
+ON CONFLICT (email) DO NOTHING;
+
+-- Statement-level triggers with transition tables, so bulk COPY/INSERT ...
+-- SELECT loads maintain the set with one set-based statement each
+
+CREATE OR REPLACE FUNCTION eligible_recipients_add() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO eligible_recipients (email, category)
+    SELECT n.email, TG_ARGV[0]
+    FROM new_rows n
+    WHERE NOT EXISTS (SELECT 1 FROM sent_emails s WHERE s.email = n.email)
+      AND NOT EXISTS (SELECT 1 FROM unsubscribe_emails u WHERE u.email = n.email)
+    ORDER BY n.id
+    ON CONFLICT (email) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION eligible_recipients_remove() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM eligible_recipients e
+    USING new_rows n
+    WHERE e.email = n.email;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS personal_emails_eligible ON personal_emails;
+CREATE TRIGGER personal_emails_eligible
+    AFTER INSERT ON personal_emails
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION eligible_recipients_add('personal');
+
+DROP TRIGGER IF EXISTS business_emails_eligible ON business_emails;
+CREATE TRIGGER business_emails_eligible
+    AFTER INSERT ON business_emails
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION eligible_recipients_add('business');
+
+DROP TRIGGER IF EXISTS sent_emails_eligible ON sent_emails;
+CREATE TRIGGER sent_emails_eligible
+    AFTER INSERT ON sent_emails
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION eligible_recipients_remove();
+
+DROP TRIGGER IF EXISTS unsubscribe_emails_eligible ON unsubscribe_emails;
+CREATE TRIGGER unsubscribe_emails_eligible
+    AFTER INSERT ON unsubscribe_emails
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION eligible_recipients_remove();
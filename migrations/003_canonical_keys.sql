@@ -0,0 +1,61 @@
+-- Canonical mailbox identity (see canonical.py): spelling variants such as
+-- J.Doe@gmail.com and jdoe+news@googlemail.com share one canonical_key, and
+-- dedupe and suppression compare keys instead of raw addresses.
+--
+-- Existing rows start with a NULL key; run backfill_canonical_keys.py once
+-- after this migration. Writers set the key on every insert from then on.
+
+ALTER TABLE personal_emails ADD COLUMN IF NOT EXISTS canonical_key TEXT;
+ALTER TABLE business_emails ADD COLUMN IF NOT EXISTS canonical_key TEXT;
+ALTER TABLE sent_emails ADD COLUMN IF NOT EXISTS canonical_key TEXT;
+ALTER TABLE unsubscribe_emails ADD COLUMN IF NOT EXISTS canonical_key TEXT;
+ALTER TABLE eligible_recipients ADD COLUMN IF NOT EXISTS canonical_key TEXT;
+
+CREATE INDEX IF NOT EXISTS personal_emails_canonical_key_idx
+    ON personal_emails (canonical_key);
+CREATE INDEX IF NOT EXISTS business_emails_canonical_key_idx
+    ON business_emails (canonical_key);
+CREATE INDEX IF NOT EXISTS sent_emails_canonical_key_idx
+    ON sent_emails (canonical_key);
+CREATE INDEX IF NOT EXISTS unsubscribe_emails_canonical_key_idx
+    ON unsubscribe_emails (canonical_key);
+CREATE INDEX IF NOT EXISTS eligible_recipients_canonical_key_idx
+    ON eligible_recipients (canonical_key);
+
+-- Eligibility now keys on the canonical identity: a new address is skipped
+-- when any spelling of it was already mailed, unsubscribed or queued, and a
+-- send or unsubscribe removes every queued spelling. Rows written before the
+-- backfill still match on the exact address.
+
+CREATE OR REPLACE FUNCTION eligible_recipients_add() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO eligible_recipients (email, category, canonical_key)
+    SELECT DISTINCT ON (COALESCE(n.canonical_key, n.email))
+        n.email, TG_ARGV[0], n.canonical_key
+    FROM new_rows n
+    WHERE NOT EXISTS (SELECT 1 FROM sent_emails s WHERE s.email = n.email)
+      AND NOT EXISTS (SELECT 1 FROM unsubscribe_emails u WHERE u.email = n.email)
+      AND (n.canonical_key IS NULL OR (
+          NOT EXISTS (SELECT 1 FROM sent_emails s WHERE s.canonical_key = n.canonical_key)
+          AND NOT EXISTS (SELECT 1 FROM unsubscribe_emails u WHERE u.canonical_key = n.canonical_key)
+          AND NOT EXISTS (SELECT 1 FROM eligible_recipients e WHERE e.canonical_key = n.canonical_key)
+      ))
+    ORDER BY COALESCE(n.canonical_key, n.email), n.id
+    ON CONFLICT (email) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION eligible_recipients_remove() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM eligible_recipients e
+    USING new_rows n
+    WHERE e.email = n.email;
+
+    DELETE FROM eligible_recipients e
+    USING new_rows n
+    WHERE n.canonical_key IS NOT NULL
+      AND e.canonical_key = n.canonical_key;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
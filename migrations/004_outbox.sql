@@ -0,0 +1,39 @@
+-- Durable campaign outbox. A campaign is created as a draft with its
+-- recipients enqueued set-based from eligible_recipients, approved up front
+-- (outbox.py approve), and then drained by any number of sender processes
+-- that claim batches with FOR UPDATE SKIP LOCKED under a time-limited lease.
+
+CREATE TABLE IF NOT EXISTS campaigns (
+    id BIGSERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    template TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'draft'
+        CHECK (status IN ('draft', 'approved', 'sending', 'completed', 'cancelled')),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    approved_at TIMESTAMPTZ,
+    approved_by TEXT,
+    completed_at TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGSERIAL PRIMARY KEY,
+    campaign_id BIGINT NOT NULL REFERENCES campaigns (id),
+    email TEXT NOT NULL,
+    canonical_key TEXT,
+    status TEXT NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'sending', 'sent', 'failed', 'suppressed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_by TEXT,
+    lease_expires_at TIMESTAMPTZ,
+    last_error TEXT,
+    sent_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    UNIQUE (campaign_id, email)
+);
+
+-- Claiming scans only the rows that can still be claimed
+CREATE INDEX IF NOT EXISTS outbox_pending_idx
+    ON outbox (campaign_id, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS outbox_leased_idx
+    ON outbox (lease_expires_at) WHERE status = 'sending';
@@ -0,0 +1,41 @@
+-- Change feed for the sender's in-memory suppression set (suppression.py):
+-- every insert into unsubscribe_emails or sent_emails is announced on the
+-- "suppression" channel as newline-separated canonical keys. Notifications
+-- are delivered on commit, so listeners never see rows that roll back.
+--
+-- NOTIFY payloads are limited to 8000 bytes, so keys go out in chunks of 25
+-- (addresses are at most 254 characters).
+
+CREATE OR REPLACE FUNCTION suppression_notify() RETURNS trigger AS $$
+DECLARE
+    payload TEXT;
+BEGIN
+    FOR payload IN
+        SELECT string_agg(k.key, E'\n')
+        FROM (
+            SELECT COALESCE(n.canonical_key, lower(n.email)) AS key,
+                   (row_number() OVER () - 1) / 25 AS chunk
+            FROM new_rows n
+        ) k
+        GROUP BY k.chunk
+    LOOP
+        PERFORM pg_notify('suppression', payload);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS unsubscribe_emails_notify ON unsubscribe_emails;
+CREATE TRIGGER unsubscribe_emails_notify
+    AFTER INSERT ON unsubscribe_emails
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION suppression_notify();
+
+DROP TRIGGER IF EXISTS sent_emails_notify ON sent_emails;
+CREATE TRIGGER sent_emails_notify
+    AFTER INSERT ON sent_emails
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION suppression_notify();
+
+-- The full reload reads recent sends by time
+CREATE INDEX IF NOT EXISTS sent_emails_sent_at_idx ON sent_emails (sent_at);
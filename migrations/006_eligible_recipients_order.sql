@@ -0,0 +1,28 @@
+-- eligible_recipients is consumed oldest first by id, so its rows have to be
+-- inserted in the order the addresses were stored. 003 picked one spelling
+-- per canonical key with DISTINCT ON, whose ORDER BY also set the insert
+-- order (by key, not by id); the pick now happens in a subquery and the
+-- insert itself is ordered by id.
+
+CREATE OR REPLACE FUNCTION eligible_recipients_add() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO eligible_recipients (email, category, canonical_key)
+    SELECT k.email, TG_ARGV[0], k.canonical_key
+    FROM (
+        SELECT DISTINCT ON (COALESCE(n.canonical_key, n.email))
+            n.id, n.email, n.canonical_key
+        FROM new_rows n
+        WHERE NOT EXISTS (SELECT 1 FROM sent_emails s WHERE s.email = n.email)
+          AND NOT EXISTS (SELECT 1 FROM unsubscribe_emails u WHERE u.email = n.email)
+          AND (n.canonical_key IS NULL OR (
+              NOT EXISTS (SELECT 1 FROM sent_emails s WHERE s.canonical_key = n.canonical_key)
+              AND NOT EXISTS (SELECT 1 FROM unsubscribe_emails u WHERE u.canonical_key = n.canonical_key)
+              AND NOT EXISTS (SELECT 1 FROM eligible_recipients e WHERE e.canonical_key = n.canonical_key)
+          ))
+        ORDER BY COALESCE(n.canonical_key, n.email), n.id
+    ) k
+    ORDER BY k.id
+    ON CONFLICT (email) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
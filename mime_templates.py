@@ -0,0 +1,181 @@
+import html
+import quopri
+import re
+import secrets
+from email.header import Header
+from email.utils import formatdate, make_msgid
+from html.parser import HTMLParser
+
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Stand-in for placeholders while the plain-text part is derived from the HTML
+SENTINEL = "\x00{}\x00"
+SENTINEL_RE = re.compile("\x00(\\w+)\x00")
+
+CRLF = b"\r\n"
+SOFT_BREAK = b"=\r\n"
+
+BLOCK_TAGS = {"p", "div", "tr", "table", "h1", "h2", "h3", "h4", "ul", "ol", "br"}
+SKIPPED_TAGS = {"head", "style", "script", "title"}
+
+
+# Plain-text rendering of the HTML: block elements become line breaks, list
+# items get a dash and links keep their target next to the text
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip = 0
+        self.href = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+        elif tag == "li":
+            self.parts.append("\n- ")
+        elif tag == "a":
+            self.href = dict(attrs).get("href")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+        elif tag == "a" and self.href:
+            target = self.href
+            if target.startswith("mailto:"):
+                target = target[len("mailto:") :].split("?", 1)[0]
+            self.parts.append(f" ({target})")
+            self.href = None
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self.parts).split("\n"))
+        text = "\n".join(lines)
+        return re.sub(r"\n{3,}", "\n\n", text).strip() + "\n"
+
+
+def html_to_text(html_source):
+    parser = _TextExtractor()
+    parser.feed(html_source)
+    parser.close()
+    return parser.text()
+
+
+# Quoted-printable bytes for one piece of a body, always ending on a line
+# boundary: a hard break if the text ends with one, else a soft "=" break that
+# the decoder removes. Pieces encoded separately can then be concatenated
+# without any line going over the 76 character limit.
+def qp_segment(text):
+    if not text:
+        return b""
+    encoded = quopri.encodestring(text.encode("utf-8")).replace(b"\n", CRLF)
+    return encoded if text.endswith("\n") else encoded + SOFT_BREAK
+
+
+# Split text with {{ name }} placeholders into a list of pre-encoded static
+# byte strings and placeholder names
+def compile_segments(text, pattern=PLACEHOLDER_RE):
+    segments = []
+    pos = 0
+    for match in pattern.finditer(text):
+        segments.append(qp_segment(text[pos : match.start()]))
+        segments.append(match.group(1))
+        pos = match.end()
+    segments.append(qp_segment(text[pos:]))
+    return [s for s in segments if s != b""]
+
+
+# A campaign message compiled once: headers and both bodies are serialized
+# and quoted-printable encoded up front, and render() only encodes the
+# per-recipient values and joins byte strings. The result is a complete
+# RFC 5322 message for smtplib's sendmail().
+class CompiledTemplate:
+    def __init__(self, html_source, subject, from_addr):
+        html_source = html_source.replace("\r\n", "\n")
+        self.names = set(PLACEHOLDER_RE.findall(html_source))
+        # make_msgid() would otherwise look up the host name for every message
+        self.msgid_domain = (from_addr or "").rpartition("@")[2] or None
+        self.boundary = f"=_part_{secrets.token_hex(12)}"
+
+        text_source = html_to_text(
+            PLACEHOLDER_RE.sub(lambda m: SENTINEL.format(m.group(1)), html_source)
+        )
+        if self.boundary in html_source or self.boundary in text_source:
+            raise ValueError("MIME boundary occurs in the template body")
+        text_segments = compile_segments(text_source, SENTINEL_RE)
+        html_segments = compile_segments(html_source)
+
+        subject_header = Header(subject, "utf-8").encode()
+        head = (
+            f"From: {from_addr}\r\n"
+            f"Subject: {subject_header}\r\n"
+            f"MIME-Version: 1.0\r\n"
+            f"Content-Type: multipart/alternative;\r\n"
+            f' boundary="{self.boundary}"\r\n'
+            f"\r\n"
+        ).encode("ascii")
+        part_head = (
+            "--{boundary}\r\n"
+            "Content-Type: text/{subtype}; charset=utf-8\r\n"
+            "Content-Transfer-Encoding: quoted-printable\r\n"
+            "\r\n"
+        )
+        text_head = part_head.format(boundary=self.boundary, subtype="plain")
+        html_head = part_head.format(boundary=self.boundary, subtype="html")
+        tail = f"\r\n--{self.boundary}--\r\n"
+
+        # (kind, value) pairs: "bytes" is literal, "text"/"html" a placeholder.
+        # Adjacent literals are merged so render() joins as few as possible.
+        pieces = [("bytes", head + text_head.encode("ascii"))]
+        pieces += [self._piece(s, "text") for s in text_segments]
+        pieces.append(("bytes", b"\r\n" + html_head.encode("ascii")))
+        pieces += [self._piece(s, "html") for s in html_segments]
+        pieces.append(("bytes", tail.encode("ascii")))
+
+        self.pieces = []
+        for kind, value in pieces:
+            if kind == "bytes" and self.pieces and self.pieces[-1][0] == "bytes":
+                self.pieces[-1] = ("bytes", self.pieces[-1][1] + value)
+            else:
+                self.pieces.append((kind, value))
+
+    @staticmethod
+    def _piece(segment, part):
+        return ("bytes", segment) if isinstance(segment, bytes) else (part, segment)
+
+    # Serialized message for one recipient; values fill the placeholders and
+    # are HTML-escaped in the HTML part. extra_headers is a list of
+    # (name, value) pairs of ASCII per-recipient headers.
+    def render(self, recipient, extra_headers=(), **values):
+        missing = self.names - values.keys()
+        if missing:
+            raise KeyError(f"No value for template placeholders: {sorted(missing)}")
+
+        headers = "".join(f"{name}: {value}\r\n" for name, value in extra_headers)
+        out = [
+            (
+                f"To: {recipient}\r\n"
+                f"Date: {formatdate(localtime=True)}\r\n"
+                f"Message-ID: {make_msgid(domain=self.msgid_domain)}\r\n"
+                f"{headers}"
+            ).encode("utf-8")
+        ]
+        for kind, value in self.pieces:
+            if kind == "bytes":
+                out.append(value)
+            elif kind == "html":
+                out.append(qp_segment(html.escape(str(values[value]))))
+            else:
+                out.append(qp_segment(str(values[value])))
+        return b"".join(out)
+
+
+def load_template(path, subject, from_addr):
+    with open(path, "r", encoding="utf-8") as f:
+        return CompiledTemplate(f.read(), subject, from_addr)
@@ -0,0 +1,353 @@
+import argparse
+import os
+import socket
+
+import db
+
+# Default campaign content, matching the sauna campaign in send_promotional_emails
+DEFAULT_TEMPLATE = "email_template_sauna.html"
+DEFAULT_SUBJECT = "🔥 Give Your Sauna a Refresh!"
+
+# A claimed batch must be sent within the lease, after which other senders
+# may claim the same rows again; senders renew it while they work through a
+# batch (see renew_lease)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "900"))
+
+# Rows whose lease expired this many times are given up on
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "3"))
+
+ACTIVE_STATUSES = ("approved", "sending")
+
+# Error passed to complete_batch() for a recipient the sender found
+# suppressed after claiming it
+SUPPRESSED = "suppressed"
+
+
+def sender_id(worker=None):
+    base = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{base}:{worker}" if worker else base
+
+
+# Create a draft campaign and enqueue its recipients straight from
+# eligible_recipients in one INSERT ... SELECT. Returns (campaign_id, count).
+def create_campaign(name, categories, limit, template, subject):
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO campaigns (name, template, subject) "
+                "VALUES (%s, %s, %s) RETURNING id;",
+                (name, template, subject),
+            )
+            campaign_id = cursor.fetchone()[0]
+            cursor.execute(
+                """
+                INSERT INTO outbox (campaign_id, email, canonical_key)
+                SELECT %s, e.email, e.canonical_key
+                FROM eligible_recipients e
+                WHERE e.category = ANY(%s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM outbox o
+                      JOIN campaigns c ON c.id = o.campaign_id
+                      WHERE o.email = e.email
+                        AND c.status IN ('draft', 'approved', 'sending')
+                        AND o.status IN ('pending', 'sending')
+                  )
+                ORDER BY e.id
+                LIMIT %s
+                ON CONFLICT (campaign_id, email) DO NOTHING;
+                """,
+                (campaign_id, list(categories), limit),
+            )
+            count = cursor.rowcount
+    return campaign_id, count
+
+
+def set_campaign_status(campaign_id, status, from_statuses, approved_by=None):
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE campaigns
+                SET status = %s,
+                    approved_at = CASE WHEN %s = 'approved' THEN NOW()
+                                       ELSE approved_at END,
+                    approved_by = COALESCE(%s, approved_by)
+                WHERE id = %s AND status = ANY(%s);
+                """,
+                (status, status, approved_by, campaign_id, list(from_statuses)),
+            )
+            return cursor.rowcount == 1
+
+
+# Claim up to batch_size messages of approved campaigns for this sender.
+# Rows are locked with SKIP LOCKED, so concurrent senders never wait on or
+# double-claim each other's rows; rows whose lease ran out are claimable
+# again. Recipients sent or unsubscribed meanwhile (under any spelling) are
+# marked suppressed instead of being returned.
+# Returns ([(outbox_id, campaign_id, email)], claimed): claimed counts the
+# suppressed rows too, so a batch that was all suppressed is not taken for
+# an empty outbox.
+def claim_batch(leased_by, batch_size=OUTBOX_BATCH_SIZE):
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE outbox
+                SET status = 'failed', last_error = 'lease expired too often',
+                    leased_by = NULL, lease_expires_at = NULL, updated_at = NOW()
+                WHERE status = 'sending' AND lease_expires_at < NOW()
+                  AND attempts >= %s;
+                """,
+                (OUTBOX_MAX_ATTEMPTS,),
+            )
+            cursor.execute(
+                """
+                WITH claimable AS (
+                    SELECT o.id
+                    FROM outbox o
+                    JOIN campaigns c ON c.id = o.campaign_id
+                    WHERE c.status = ANY(%s)
+                      AND (o.status = 'pending'
+                           OR (o.status = 'sending' AND o.lease_expires_at < NOW()))
+                    ORDER BY o.campaign_id, o.id
+                    LIMIT %s
+                    FOR UPDATE OF o SKIP LOCKED
+                )
+                UPDATE outbox o
+                SET status = CASE
+                        WHEN EXISTS (SELECT 1 FROM sent_emails s
+                                     WHERE s.email = o.email
+                                        OR s.canonical_key = o.canonical_key)
+                          OR EXISTS (SELECT 1 FROM unsubscribe_emails u
+                                     WHERE u.email = o.email
+                                        OR u.canonical_key = o.canonical_key)
+                        THEN 'suppressed' ELSE 'sending' END,
+                    attempts = o.attempts + 1,
+                    leased_by = %s,
+                    lease_expires_at = NOW() + make_interval(secs => %s),
+                    updated_at = NOW()
+                FROM claimable
+                WHERE o.id = claimable.id
+                RETURNING o.id, o.campaign_id, o.email, o.status;
+                """,
+                (list(ACTIVE_STATUSES), batch_size, leased_by, OUTBOX_LEASE_SECONDS),
+            )
+            rows = cursor.fetchall()
+            campaign_ids = sorted({row[1] for row in rows})
+            if campaign_ids:
+                cursor.execute(
+                    "UPDATE campaigns SET status = 'sending' "
+                    "WHERE id = ANY(%s) AND status = 'approved';",
+                    (campaign_ids,),
+                )
+    sending = [(row[0], row[1], row[2]) for row in rows if row[3] == "sending"]
+    return sending, len(rows)
+
+
+# Push the lease of rows this sender still holds another OUTBOX_LEASE_SECONDS
+# out, so a batch slowed down by rate limiting is not reclaimed mid-send.
+# Returns the ids still held; any others were reclaimed and must not be sent.
+def renew_lease(leased_by, outbox_ids):
+    if not outbox_ids:
+        return set()
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE outbox
+                SET lease_expires_at = NOW() + make_interval(secs => %s),
+                    updated_at = NOW()
+                WHERE id = ANY(%s) AND status = 'sending' AND leased_by = %s
+                RETURNING id;
+                """,
+                (OUTBOX_LEASE_SECONDS, list(outbox_ids), leased_by),
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+
+# Record the outcome of a claimed batch in one statement. results is
+# [(outbox_id, error, retry)] with error None for a delivered message and
+# SUPPRESSED for a skipped one; failed messages marked retry (e.g. throttled)
+# go back to pending until they run out of attempts. Only rows still leased
+# by this sender are updated; returns the ids of the others, whose outcome
+# was dropped because their lease had been lost.
+def complete_batch(leased_by, results):
+    if not results:
+        return []
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE outbox o
+                SET status = CASE
+                        WHEN r.error IS NULL THEN 'sent'
+                        WHEN r.error = %s THEN 'suppressed'
+                        WHEN r.retry AND o.attempts < %s THEN 'pending'
+                        ELSE 'failed' END,
+                    last_error = r.error,
+                    sent_at = CASE WHEN r.error IS NULL THEN NOW() END,
+                    leased_by = NULL,
+                    lease_expires_at = NULL,
+                    updated_at = NOW()
+                FROM unnest(%s::bigint[], %s::text[], %s::boolean[])
+                    AS r(id, error, retry)
+                WHERE o.id = r.id AND o.status = 'sending' AND o.leased_by = %s
+                RETURNING o.id;
+                """,
+                (
+                    SUPPRESSED,
+                    OUTBOX_MAX_ATTEMPTS,
+                    [outbox_id for outbox_id, _, _ in results],
+                    [error for _, error, _ in results],
+                    [retry for _, _, retry in results],
+                    leased_by,
+                ),
+            )
+            updated = {row[0] for row in cursor.fetchall()}
+    return [outbox_id for outbox_id, _, _ in results if outbox_id not in updated]
+
+
+# Hand rows back unsent, e.g. when the relay is down: they return to pending
+# and the claim's attempt is taken back, since no send was really tried on
+# its merits. Only rows still leased by this sender are released.
+def release_batch(leased_by, outbox_ids, error):
+    if not outbox_ids:
+        return
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE outbox
+                SET status = 'pending',
+                    attempts = GREATEST(attempts - 1, 0),
+                    last_error = %s,
+                    leased_by = NULL,
+                    lease_expires_at = NULL,
+                    updated_at = NOW()
+                WHERE id = ANY(%s) AND status = 'sending' AND leased_by = %s;
+                """,
+                (error, list(outbox_ids), leased_by),
+            )
+
+
+# Mark campaigns with nothing left to send as completed
+def finish_campaigns():
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE campaigns c
+                SET status = 'completed', completed_at = NOW()
+                WHERE c.status = ANY(%s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM outbox o
+                      WHERE o.campaign_id = c.id
+                        AND o.status IN ('pending', 'sending')
+                  )
+                RETURNING c.id, c.name;
+                """,
+                (list(ACTIVE_STATUSES),),
+            )
+            return cursor.fetchall()
+
+
+def get_campaigns(campaign_ids):
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, name, template, subject FROM campaigns WHERE id = ANY(%s);",
+                (list(campaign_ids),),
+            )
+            return {row[0]: row[1:] for row in cursor.fetchall()}
+
+
+def print_status(campaign_id=None):
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.id, c.name, c.status, c.approved_by,
+                       COUNT(o.id) FILTER (WHERE o.status = 'pending'),
+                       COUNT(o.id) FILTER (WHERE o.status = 'sending'),
+                       COUNT(o.id) FILTER (WHERE o.status = 'sent'),
+                       COUNT(o.id) FILTER (WHERE o.status = 'failed'),
+                       COUNT(o.id) FILTER (WHERE o.status = 'suppressed')
+                FROM campaigns c
+                LEFT JOIN outbox o ON o.campaign_id = c.id
+                WHERE %s IS NULL OR c.id = %s
+                GROUP BY c.id
+                ORDER BY c.id;
+                """,
+                (campaign_id, campaign_id),
+            )
+            rows = cursor.fetchall()
+
+    if not rows:
+        print("No campaigns found.")
+    for cid, name, status, approved_by, *counts in rows:
+        pending, sending, sent, failed, suppressed = counts
+        approved = f" (approved by {approved_by})" if approved_by else ""
+        print(
+            f"#{cid} {name}: {status}{approved} - {pending} pending, "
+            f"{sending} sending, {sent} sent, {failed} failed, "
+            f"{suppressed} suppressed"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage campaign outbox")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="create a draft campaign")
+    create.add_argument("name")
+    create.add_argument(
+        "--categories", default="personal", help="comma separated address categories"
+    )
+    create.add_argument(
+        "--limit", type=int, default=int(os.getenv("DAILY_LIMIT", "400"))
+    )
+    create.add_argument("--template", default=DEFAULT_TEMPLATE)
+    create.add_argument("--subject", default=DEFAULT_SUBJECT)
+
+    approve = commands.add_parser("approve", help="release a draft for sending")
+    approve.add_argument("campaign_id", type=int)
+    approve.add_argument("--by", default=os.getenv("USER", "unknown"))
+
+    cancel = commands.add_parser("cancel", help="stop a campaign")
+    cancel.add_argument("campaign_id", type=int)
+
+    status = commands.add_parser("status", help="show campaign progress")
+    status.add_argument("campaign_id", type=int, nargs="?")
+
+    args = parser.parse_args()
+
+    if args.command == "create":
+        if not os.path.exists(args.template):
+            parser.error(f"Template {args.template} not found")
+        categories = [c.strip() for c in args.categories.split(",") if c.strip()]
+        campaign_id, count = create_campaign(
+            args.name, categories, args.limit, args.template, args.subject
+        )
+        print(f"✅ Campaign #{campaign_id} created with {count} recipients.")
+        print(f"Review it, then run: python outbox.py approve {campaign_id}")
+    elif args.command == "approve":
+        if set_campaign_status(
+            args.campaign_id, "approved", ["draft"], approved_by=args.by
+        ):
+            print(f"✅ Campaign #{args.campaign_id} approved by {args.by}.")
+        else:
+            print(f"🚫 Campaign #{args.campaign_id} is not a draft.")
+    elif args.command == "cancel":
+        if set_campaign_status(
+            args.campaign_id, "cancelled", ["draft", "approved", "sending"]
+        ):
+            print(f"✅ Campaign #{args.campaign_id} cancelled.")
+        else:
+            print(f"🚫 Campaign #{args.campaign_id} cannot be cancelled.")
+    else:
+        print_status(args.campaign_id)
+
+
+if __name__ == "__main__":
+    main()
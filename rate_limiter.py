@@ -0,0 +1,179 @@
+import os
+import smtplib
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from canonical import DOMAIN_ALIASES
+
+# Load environment variables
+load_dotenv()
+
+# Sending rate per sender account, in messages per minute. Sending starts at
+# SEND_RATE_PER_MINUTE and ramps up towards SEND_MAX_RATE_PER_MINUTE while the
+# relay accepts everything; throttling replies cut the rate back down.
+SEND_RATE_PER_MINUTE = float(os.getenv("SEND_RATE_PER_MINUTE", "5"))
+SEND_MAX_RATE_PER_MINUTE = float(os.getenv("SEND_MAX_RATE_PER_MINUTE", "30"))
+SEND_MIN_RATE_PER_MINUTE = float(os.getenv("SEND_MIN_RATE_PER_MINUTE", "0.5"))
+
+# Messages that may go out back to back before the rate applies
+SEND_BURST = float(os.getenv("SEND_BURST", "1"))
+
+# Per recipient domain ceilings, e.g. "gmail.com=20,outlook.com=10"
+# (messages per minute); other domains share SEND_DOMAIN_RATE_PER_MINUTE
+SEND_DOMAIN_RATE_PER_MINUTE = float(os.getenv("SEND_DOMAIN_RATE_PER_MINUTE", "20"))
+DOMAIN_RATE_LIMITS = {
+    domain.strip().lower(): float(rate)
+    for domain, _, rate in (
+        item.partition("=")
+        for item in os.getenv("DOMAIN_RATE_LIMITS", "").split(",")
+        if "=" in item
+    )
+}
+
+# AIMD: each accepted message adds RATE_INCREASE_PER_MINUTE to the rate, each
+# throttling reply multiplies it by RATE_BACKOFF_FACTOR
+RATE_INCREASE_PER_MINUTE = float(os.getenv("RATE_INCREASE_PER_MINUTE", "0.5"))
+RATE_BACKOFF_FACTOR = float(os.getenv("RATE_BACKOFF_FACTOR", "0.5"))
+
+# 421 and 45x replies mean "slow down / try later"
+THROTTLE_CODES = {421} | set(range(450, 460))
+
+
+# Token bucket whose refill rate adapts: additive increase on success up to
+# max_rate, multiplicative decrease on throttling down to min_rate. Rates are
+# in messages per second. Not thread-safe on its own, see RateLimiter.
+class TokenBucket:
+    def __init__(self, rate, max_rate, min_rate, burst=SEND_BURST):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = min(rate, max_rate)
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until a token is available
+    def wait_time(self, now):
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def increase(self):
+        self.rate = min(self.max_rate, self.rate + RATE_INCREASE_PER_MINUTE / 60)
+
+    def back_off(self):
+        self.rate = max(self.min_rate, self.rate * RATE_BACKOFF_FACTOR)
+        # Spend the current allowance so the pause starts right away
+        self.tokens = min(self.tokens, 0.0)
+
+
+def _per_second(per_minute):
+    return per_minute / 60
+
+
+def recipient_domain(recipient):
+    domain = recipient.rpartition("@")[2].lower()
+    return DOMAIN_ALIASES.get(domain, domain)
+
+
+# SMTP reply codes carried by an exception raised while sending
+def reply_codes(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return {code for code, _ in error.recipients.values()}
+    if isinstance(error, smtplib.SMTPResponseException):
+        return {error.smtp_code}
+    return set()
+
+
+# The relay itself is unusable rather than the message refused: no SMTP
+# reply at all (connection refused or dropped, timeout) or a failed
+# connect or login. Every further message would fail the same way.
+def relay_unavailable(error):
+    if isinstance(
+        error,
+        (
+            smtplib.SMTPConnectError,
+            smtplib.SMTPAuthenticationError,
+            smtplib.SMTPServerDisconnected,
+        ),
+    ):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+# Buckets per sender account and per recipient domain; a message goes out
+# once both have a token. Safe to share between sending threads.
+class RateLimiter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.accounts = {}
+        self.domains = {}
+        self.throttled = 0
+
+    def _account(self, account):
+        bucket = self.accounts.get(account)
+        if bucket is None:
+            bucket = self.accounts[account] = TokenBucket(
+                _per_second(SEND_RATE_PER_MINUTE),
+                _per_second(SEND_MAX_RATE_PER_MINUTE),
+                _per_second(SEND_MIN_RATE_PER_MINUTE),
+            )
+        return bucket
+
+    def _domain(self, domain):
+        bucket = self.domains.get(domain)
+        if bucket is None:
+            ceiling = _per_second(
+                DOMAIN_RATE_LIMITS.get(domain, SEND_DOMAIN_RATE_PER_MINUTE)
+            )
+            bucket = self.domains[domain] = TokenBucket(
+                ceiling, ceiling, _per_second(SEND_MIN_RATE_PER_MINUTE)
+            )
+        return bucket
+
+    # Block until account and recipient domain both allow another message
+    def acquire(self, account, recipient):
+        domain = recipient_domain(recipient)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                account_bucket = self._account(account)
+                domain_bucket = self._domain(domain)
+                wait = max(account_bucket.wait_time(now), domain_bucket.wait_time(now))
+                if wait <= 0:
+                    account_bucket.take()
+                    domain_bucket.take()
+                    return
+            time.sleep(wait)
+
+    # Feed back the outcome of a send: None for success, else the exception.
+    # A throttling reply to RCPT slows down the recipient's domain, one to
+    # the connection, MAIL or DATA slows down the whole account. Returns True
+    # when the reply was a throttling one.
+    def record(self, account, recipient, error=None):
+        domain = recipient_domain(recipient)
+        throttled = bool(reply_codes(error) & THROTTLE_CODES)
+        with self.lock:
+            account_bucket = self._account(account)
+            domain_bucket = self._domain(domain)
+            if throttled:
+                self.throttled += 1
+                if isinstance(error, smtplib.SMTPRecipientsRefused):
+                    domain_bucket.back_off()
+                else:
+                    account_bucket.back_off()
+            elif error is None:
+                account_bucket.increase()
+                domain_bucket.increase()
+        return throttled
+
+    def rate_per_minute(self, account):
+        with self.lock:
+            return self._account(account).rate * 60
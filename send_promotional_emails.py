@@ -1,40 +1,74 @@
-import psycopg2
-import smtplib
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from dotenv import load_dotenv
 import os
 from datetime import datetime
 
+import db
+import events
+import outbox
+import unsubscribe_tokens
+from canonical import canonical_key
+from mime_templates import load_template
+from rate_limiter import RateLimiter, relay_unavailable
+from smtp_session import SMTPSession
+from suppression import SuppressionSet, SuppressionUnavailable
+from write_behind import WriteBehindJournal
+
 # Load environment variables
 load_dotenv()
 
-# PostgreSQL credentials
-DB_HOST = os.getenv("DB_HOST")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASS = os.getenv("DB_PASS")
-
 # Email SMTP settings
 EMAIL_ACCOUNT = os.getenv("EMAIL_ACCOUNT")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 SMTP_SERVER = os.getenv("SMTP_SERVER")
 SMTP_PORT = int(os.getenv("SMTP_PORT"))
 REPORT_RECIPIENT = os.getenv("REPORT_RECIPIENT")
+# Only disable for local stand-in servers, see benchmarks/
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "TRUE").upper() == "TRUE"
 
 # Test mode settings
 TEST_MODE = os.getenv("TEST_MODE", "FALSE").upper() == "TRUE"
 TEST_EMAIL = os.getenv("TEST_EMAIL")
 
-# Campaign configuration
-DAILY_LIMIT = 400
-DELAY_BETWEEN_EMAILS = 12  # seconds (5 emails per minute)
+# Campaign configuration; pacing is done by rate_limiter (SEND_RATE_PER_MINUTE etc.)
+DAILY_LIMIT = int(os.getenv("DAILY_LIMIT", "400"))
 DAY_INTERVAL = 24 * 60 * 60  # seconds in a day
 
-# Load email template for the sauna refurbishment campaign
-with open("email_template_sauna.html", "r") as file:
-    EMAIL_TEMPLATE = file.read()
+# Parallel senders, each with its own SMTP connection; all of them share one
+# rate limiter, so this adds concurrency, not extra volume
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "1"))
+
+# "list": pick DAILY_LIMIT recipients and confirm on the console, once a day.
+# "outbox": drain approved campaigns from the outbox table (see outbox.py);
+# any number of senders can run side by side.
+SEND_MODE = os.getenv("SEND_MODE", "list").lower()
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "60"))
+
+# Successful sends are journaled locally (fsync'd) and written to sent_emails
+# in batches; the journal is replayed before the next campaign picks recipients
+SENT_JOURNAL_FILE = os.getenv("SENT_JOURNAL_FILE", "sent_emails.journal")
+SENT_LOG_BATCH_SIZE = int(os.getenv("SENT_LOG_BATCH_SIZE", "200"))
+SENT_LOG_FLUSH_SECONDS = float(os.getenv("SENT_LOG_FLUSH_SECONDS", "10"))
+
+# Which address tables to mail: "personal", "business" or both (comma separated)
+RECIPIENT_CATEGORIES = [
+    c.strip()
+    for c in os.getenv("RECIPIENT_CATEGORIES", "personal").split(",")
+    if c.strip()
+]
+
+# Load email template for the sauna refurbishment campaign, compiled once
+# into pre-encoded MIME with a plain-text alternative (see mime_templates)
+EMAIL_SUBJECT = "🔥 Give Your Sauna a Refresh!"
+EMAIL_TEMPLATE = load_template(
+    "email_template_sauna.html", EMAIL_SUBJECT, EMAIL_ACCOUNT
+)
 
 
 def fetch_recipient_emails():
@@ -43,25 +77,20 @@ def fetch_recipient_emails():
         return [TEST_EMAIL]
 
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS
-        )
-        cursor = conn.cursor()
-
+        # eligible_recipients is kept free of sent and unsubscribed addresses
+        # by triggers (migrations/002), so this is a plain index scan
         query = """
-        SELECT email FROM personal_emails
-        WHERE email NOT IN (
-            SELECT email FROM unsubscribe_emails
-            UNION
-            SELECT email FROM sent_emails
-        )
+        SELECT email FROM eligible_recipients
+        WHERE category = ANY(%s)
+        ORDER BY id
         LIMIT %s;
         """
-        cursor.execute(query, (DAILY_LIMIT,))
-        results = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
+        with events.stage("db_read", table="eligible_recipients") as event:
+            with db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, (RECIPIENT_CATEGORIES, DAILY_LIMIT))
+                    results = cursor.fetchall()
+            event["rows"] = len(results)
 
         return [row[0] for row in results]
 
@@ -70,48 +99,94 @@ def fetch_recipient_emails():
         return []
 
 
-def send_email(recipient, smtp_server):
-    try:
-        # Prepare unsubscribe link
-        unsubscribe_link = f"http://35.176.53.188:5000/unsubscribe?email={recipient}"
+def open_smtp_session():
+    return SMTPSession(
+        SMTP_SERVER, SMTP_PORT, EMAIL_ACCOUNT, EMAIL_PASSWORD, starttls=SMTP_STARTTLS
+    )
 
-        # Personalize template
-        html_content = EMAIL_TEMPLATE.replace(
-            "{{ unsubscribe_link }}", unsubscribe_link
-        )
 
-        msg = MIMEMultipart("alternative")
-        msg["From"] = EMAIL_ACCOUNT
-        msg["To"] = recipient
-        msg["Subject"] = "🔥 Give Your Sauna a Refresh!"
+# unsubscribe_token is normally signed ahead for the whole batch (see
+# unsubscribe_tokens.sign_batch)
+def send_email(recipient, smtp_server, template=EMAIL_TEMPLATE, unsubscribe_token=None):
+    try:
+        # Signed unsubscribe link, also offered as RFC 8058 one-click header
+        # when the service is served over HTTPS
+        token = unsubscribe_token or unsubscribe_tokens.sign(recipient)
+        unsubscribe_link = unsubscribe_tokens.unsubscribe_url(token)
+        headers = [("List-Unsubscribe", f"<{unsubscribe_link}>")]
+        if unsubscribe_tokens.ONE_CLICK:
+            headers.append(("List-Unsubscribe-Post", "List-Unsubscribe=One-Click"))
 
-        msg.attach(MIMEText(html_content, "html"))
+        # Personalize template
+        with events.stage("render"):
+            message = template.render(
+                recipient, extra_headers=headers, unsubscribe_link=unsubscribe_link
+            )
 
-        smtp_server.send_message(msg)
+        with events.stage("smtp_send", bytes=len(message)):
+            smtp_server.sendmail(EMAIL_ACCOUNT, [recipient], message)
         print(f"✅ Email sent to: {recipient}")
 
     except Exception as e:
-        raise Exception(f"Failed to send email to {recipient}: {e}")
-
-
+        raise Exception(f"Failed to send email to {recipient}: {e}") from e
+
+
+# One transaction per journal batch; replays of a batch are harmless
+def write_sent_batch(records):
+    with events.stage("db_write", table="sent_emails", rows=len(records)):
+        with db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO sent_emails (email, sent_at, canonical_key)
+                    SELECT email, sent_at, canonical_key
+                    FROM unnest(%s::text[], %s::timestamptz[], %s::text[])
+                        AS r(email, sent_at, canonical_key)
+                    ON CONFLICT (email) DO NOTHING;
+                    """,
+                    (
+                        [r["email"] for r in records],
+                        [r["sent_at"] for r in records],
+                        [canonical_key(r["email"]) for r in records],
+                    ),
+                )
+    print(f"📝 Logged {len(records)} sent emails to the database")
+
+
+SENT_LOG = WriteBehindJournal(
+    SENT_JOURNAL_FILE,
+    write_sent_batch,
+    batch_size=SENT_LOG_BATCH_SIZE,
+    flush_seconds=SENT_LOG_FLUSH_SECONDS,
+)
+
+# Unsubscribes and recent sends, kept current while the campaign runs
+SUPPRESSION = SuppressionSet()
+
+# Shared by every run of the process, so the rate it has adapted to and the
+# per-domain backoff carry over from one outbox poll to the next
+LIMITER = RateLimiter()
+
+
+# Durable once this returns; the database write happens in the background
 def log_sent_email(recipient):
+    SUPPRESSION.add(recipient)
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS
-        )
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO sent_emails (email, sent_at) VALUES (%s, NOW()) ON CONFLICT (email) DO NOTHING;",
-            (recipient.lower(),),
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        sent_at = datetime.now().astimezone().isoformat()
+        SENT_LOG.append({"email": recipient.lower(), "sent_at": sent_at})
     except Exception as e:
         print(f"Failed to log sent email for {recipient}: {e}")
 
 
-def send_summary_email(total, success, failure, aborted=False, failed_recipients=None):
+def send_summary_email(
+    total,
+    success,
+    failure,
+    aborted=False,
+    failed_recipients=None,
+    worker_stats=None,
+    suppressed=0,
+):
     subject = "📊 Campaign Summary Report"
     mode = "TEST MODE" if TEST_MODE else "PRODUCTION MODE"
     status = "🚫 Campaign aborted by user." if aborted else "✅ Campaign completed."
@@ -122,6 +197,14 @@ def send_summary_email(total, success, failure, aborted=False, failed_recipients
             f"- {email}" for email in failed_recipients
         )
 
+    workers_list = ""
+    if worker_stats:
+        workers_list = "\n👷 Workers:\n" + "\n".join(
+            f"- {name}: {stats['sent']} sent, {stats['failed']} failed, "
+            f"{stats['connections']} SMTP connections, {stats['seconds']:.0f}s"
+            for name, stats in sorted(worker_stats.items())
+        )
+
     body = f"""
 {status}
 
@@ -130,6 +213,8 @@ def send_summary_email(total, success, failure, aborted=False, failed_recipients
 - Total intended recipients: {total}
 - Emails sent successfully: {success}
 - Failures: {failure}
+- Skipped as unsubscribed or already mailed: {suppressed}
+{workers_list}
 {failed_list}
 
 🕒 Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -144,10 +229,9 @@ def send_summary_email(total, success, failure, aborted=False, failed_recipients
     msg.attach(MIMEText(body, "plain"))
 
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
-            server.send_message(msg)
+        with events.stage("report_email"):
+            with open_smtp_session() as session:
+                session.send_message(msg)
         print("📩 Summary email sent to you successfully!")
     except Exception as e:
         print(f"Failed to send summary email: {e}")
@@ -161,12 +245,359 @@ def send_summary_email(total, success, failure, aborted=False, failed_recipients
         print(f"Failed to write summary to log file: {e}")
 
 
+# Recipients for one worker from the shared in-memory list; tokens holds
+# their unsubscribe tokens, signed for the whole list up front
+class QueueSource:
+    def __init__(self, recipients, tokens):
+        self.recipients = recipients
+        self.tokens = tokens
+
+    # Next (recipient, template, reference, unsubscribe token), or None when done
+    def next(self):
+        try:
+            recipient = self.recipients.get_nowait()
+        except queue.Empty:
+            return None
+        return recipient, EMAIL_TEMPLATE, None, self.tokens.get(recipient)
+
+    def done(self, reference, error=None, retry=False):
+        pass
+
+    # Recipients left in the list are picked up again by the next run
+    def release(self, reference, error):
+        pass
+
+    def close(self):
+        pass
+
+
+_campaign_templates = {}
+_campaign_templates_lock = threading.Lock()
+
+
+def campaign_template(campaign_id):
+    with _campaign_templates_lock:
+        template = _campaign_templates.get(campaign_id)
+        if template is None:
+            _, path, subject = outbox.get_campaigns([campaign_id])[campaign_id]
+            template = load_template(path, subject, EMAIL_ACCOUNT)
+            _campaign_templates[campaign_id] = template
+        return template
+
+
+# Recipients for one worker claimed from the outbox a batch at a time; the
+# outcome of a batch is written back before the next one is claimed. Once
+# half the lease has passed it is renewed, so a batch held up by backoff is
+# not reclaimed by another sender while this one is still working on it.
+class OutboxSource:
+    def __init__(self, name):
+        self.leased_by = outbox.sender_id(name)
+        self.batch = []
+        self.tokens = {}
+        self.results = []
+        self.released = []
+        self.release_error = None
+        self.renew_at = 0.0
+
+    def next(self):
+        if not self.batch:
+            # A batch that was all suppressed claims nothing to send, but
+            # there may be more behind it
+            while not self.batch:
+                self.close()
+                with events.stage("outbox_claim") as event:
+                    self.batch, claimed = outbox.claim_batch(self.leased_by)
+                    event["rows"] = len(self.batch)
+                    event["suppressed"] = claimed - len(self.batch)
+                if not claimed:
+                    return None
+            self.renew_at = time.monotonic() + outbox.OUTBOX_LEASE_SECONDS / 2
+            self.batch.reverse()
+            self.tokens = unsubscribe_tokens.sign_batch(
+                [email_address for _, _, email_address in self.batch]
+            )
+        elif time.monotonic() >= self.renew_at:
+            self.renew()
+            if not self.batch:
+                return self.next()
+        outbox_id, campaign_id, email_address = self.batch.pop()
+        token = self.tokens.get(email_address)
+        return email_address, campaign_template(campaign_id), outbox_id, token
+
+    # Rows sent but not yet completed are renewed too; rows already lost
+    # to another sender are dropped from the batch unsent
+    def renew(self):
+        ids = [outbox_id for outbox_id, _, _ in self.batch]
+        ids += [outbox_id for outbox_id, _, _ in self.results]
+        with events.stage("outbox_renew", rows=len(ids)):
+            held = outbox.renew_lease(self.leased_by, ids)
+        self.renew_at = time.monotonic() + outbox.OUTBOX_LEASE_SECONDS / 2
+        lost = [row for row in self.batch if row[0] not in held]
+        if lost:
+            print(f"⚠️ Lease lost on {len(lost)} outbox rows, leaving them unsent")
+            events.count("outbox_lease_lost", len(lost))
+            self.batch = [row for row in self.batch if row[0] in held]
+
+    def done(self, reference, error=None, retry=False):
+        self.results.append((reference, error, retry))
+
+    # Give this row and the rest of the batch back to the outbox unsent
+    def release(self, reference, error):
+        self.released = [reference] + [outbox_id for outbox_id, _, _ in self.batch]
+        self.release_error = error
+        self.batch = []
+
+    def close(self):
+        if self.released:
+            with events.stage("outbox_release", rows=len(self.released)):
+                outbox.release_batch(self.leased_by, self.released, self.release_error)
+            self.released = []
+        if self.results:
+            with events.stage("outbox_complete", rows=len(self.results)):
+                lost = outbox.complete_batch(self.leased_by, self.results)
+            if lost:
+                print(
+                    f"⚠️ {len(lost)} outbox results not recorded, their lease "
+                    f"was lost: {lost}"
+                )
+                events.count("outbox_results_lost", len(lost))
+        self.results = []
+
+
+# One sending worker: its own SMTP session (probed when idle, reconnected
+# when dropped, recycled every SMTP_MAX_MESSAGES_PER_CONNECTION messages),
+# sending until its recipient source runs dry
+def send_worker(name, source, limiter, results, lock):
+    stats = {"sent": 0, "failed": 0, "suppressed": 0, "connections": 0, "seconds": 0.0}
+    started = time.monotonic()
+    # The source is closed even when the loop fails, so outcomes it has
+    # buffered are written back instead of waiting out the lease
+    with open_smtp_session() as session, closing(source):
+        while True:
+            item = source.next()
+            if item is None:
+                break
+            recipient, template, reference, token = item
+
+            # Unsubscribed or mailed under any spelling since the recipients
+            # were picked; the test address is always mailed
+            try:
+                suppressed = not TEST_MODE and SUPPRESSION.suppressed(recipient)
+            except SuppressionUnavailable as e:
+                print(f"🚫 [{name}] {e}, not sending to {recipient}")
+                source.done(reference, str(e), retry=True)
+                stats["failed"] += 1
+                with lock:
+                    results["failure"] += 1
+                    results["failed_recipients"].append(recipient)
+                continue
+            if suppressed:
+                print(f"🛡️ [{name}] Skipping suppressed recipient: {recipient}")
+                events.count("suppressed")
+                source.done(reference, outbox.SUPPRESSED)
+                stats["suppressed"] += 1
+                with lock:
+                    results["suppressed"] += 1
+                continue
+
+            # Waits as long as the account and the recipient's domain require
+            with events.stage("rate_wait"):
+                limiter.acquire(EMAIL_ACCOUNT, recipient)
+            try:
+                print(f"📩 [{name}] Sending promotional email to: {recipient}")
+                send_email(recipient, session, template, token)
+            except Exception as e:
+                print(e)
+                if relay_unavailable(e.__cause__ or e):
+                    # Failing every remaining recipient one by one would only
+                    # drain the outbox; the next run tries again
+                    print(f"🚫 [{name}] Relay unavailable, stopping this worker")
+                    events.count("relay_unavailable")
+                    source.release(reference, str(e))
+                    stats["failed"] += 1
+                    with lock:
+                        results["failure"] += 1
+                        results["failed_recipients"].append(recipient)
+                    break
+                throttled = limiter.record(EMAIL_ACCOUNT, recipient, e.__cause__ or e)
+                if throttled:
+                    print("⏳ Relay is throttling, backing off")
+                    events.count("throttled")
+                events.count("failed")
+                source.done(reference, str(e), retry=throttled)
+                stats["failed"] += 1
+                with lock:
+                    results["failure"] += 1
+                    results["failed_recipients"].append(recipient)
+                continue
+
+            limiter.record(EMAIL_ACCOUNT, recipient)
+            log_sent_email(recipient)
+            events.count("sent")
+            source.done(reference)
+            stats["sent"] += 1
+            with lock:
+                results["success"] += 1
+
+    stats["connections"] = session.stats["connections"]
+    stats["seconds"] = time.monotonic() - started
+    with lock:
+        results["workers"][name] = stats
+
+
+# Run workers over per-worker sources made by make_source(name)
+def run_campaign(make_source, workers=SEND_WORKERS, limiter=LIMITER):
+    throttled = limiter.throttled
+    lock = threading.Lock()
+    results = {
+        "success": 0,
+        "failure": 0,
+        "suppressed": 0,
+        "failed_recipients": [],
+        "workers": {},
+    }
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for i in range(workers):
+            name = f"worker-{i + 1}"
+            futures.append(
+                executor.submit(
+                    send_worker, name, make_source(name), limiter, results, lock
+                )
+            )
+        for future in futures:
+            # A worker that cannot connect leaves its share to the others
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Send worker failed: {e}")
+
+    print(
+        f"Throttled {limiter.throttled - throttled} times, final rate "
+        f"{limiter.rate_per_minute(EMAIL_ACCOUNT):.1f} emails/min"
+    )
+    return results
+
+
+def send_list(recipients):
+    recipient_queue = queue.Queue()
+    for recipient in recipients:
+        recipient_queue.put(recipient)
+
+    tokens = unsubscribe_tokens.sign_batch(recipients)
+    workers = min(SEND_WORKERS, len(recipients))
+    results = run_campaign(lambda name: QueueSource(recipient_queue, tokens), workers)
+
+    # Recipients left over when every worker failed
+    while not recipient_queue.empty():
+        results["failure"] += 1
+        results["failed_recipients"].append(recipient_queue.get_nowait())
+    return results
+
+
+# Send whatever approved campaigns have queued; unsent messages of a crashed
+# sender are picked up again once their lease expires
+def send_outbox():
+    results = run_campaign(OutboxSource)
+    for campaign_id, name in outbox.finish_campaigns():
+        print(f"✅ Campaign #{campaign_id} {name} completed.")
+
+    total = results["success"] + results["failure"]
+    if total:
+        send_summary_email(
+            total,
+            results["success"],
+            results["failure"],
+            failed_recipients=results["failed_recipients"],
+            worker_stats=results["workers"],
+            suppressed=results["suppressed"],
+        )
+    return total
+
+
 def main():
+    events.start_run("send", mode=SEND_MODE, workers=SEND_WORKERS)
+    try:
+        run_sender()
+    finally:
+        events.end_run()
+
+
+def run_sender():
+    if not unsubscribe_tokens.UNSUBSCRIBE_SECRETS:
+        print("🚫 UNSUBSCRIBE_SECRET is not set, cannot sign unsubscribe links")
+        return
+    if not unsubscribe_tokens.UNSUBSCRIBE_BASE_URL:
+        print("🚫 UNSUBSCRIBE_BASE_URL is not set, cannot link to unsubscribe_app")
+        return
+    if not start_services():
+        return
+
+    # Sends journaled by an earlier run must reach sent_emails before the
+    # recipient query, or those people would be mailed again
+    if not SENT_LOG.flush():
+        print(f"🚫 Could not write {SENT_JOURNAL_FILE} out, skipping campaign")
+        return
+
+    if SEND_MODE == "outbox":
+        send_outbox()
+    else:
+        send_daily_campaign()
+
+
+# The sent journal and the suppression set live as long as the process: the
+# set is loaded once and kept current by NOTIFY, and the journal flushes in
+# the background between runs. Returns False if either cannot be started.
+_services_started = False
+
+
+def start_services():
+    global _services_started
+    if _services_started:
+        return True
+    if not unsubscribe_tokens.ONE_CLICK:
+        print(
+            f"⚠️ {unsubscribe_tokens.UNSUBSCRIBE_BASE_URL} is not HTTPS, "
+            f"sending without one-click unsubscribe"
+        )
+
+    # Replays sends a previous process left in the journal
+    try:
+        SENT_LOG.start()
+    except Exception as e:
+        print(f"🚫 Could not replay {SENT_JOURNAL_FILE}, skipping campaign: {e}")
+        return False
+
+    try:
+        SUPPRESSION.start()
+    except Exception as e:
+        print(f"🚫 Could not load the suppression set, skipping campaign: {e}")
+        SENT_LOG.close()
+        return False
+
+    _services_started = True
+    return True
+
+
+def stop_services():
+    global _services_started
+    if not _services_started:
+        return
+    SUPPRESSION.close()
+    if not SENT_LOG.close():
+        print(f"⚠️ Unflushed sends kept in {SENT_JOURNAL_FILE} for next run")
+    _services_started = False
+
+
+def send_daily_campaign():
     recipients = fetch_recipient_emails()
     total_recipients = len(recipients)
     success_count = 0
     failure_count = 0
     failed_recipients = []
+    worker_stats = {}
+    suppressed_count = 0
 
     print(f"Total recipients: {total_recipients}")
 
@@ -205,32 +636,12 @@ def main():
             return
 
     try:
-        max_emails = min(len(recipients), DAILY_LIMIT)
-
-        for idx, recipient in enumerate(recipients, 1):
-            if idx > DAILY_LIMIT:
-                break
-
-            try:
-                print(f"📩 Sending promotional email to: {recipient}")
-
-                # Open a fresh connection for each email to avoid timeouts
-                with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-                    server.starttls()
-                    server.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
-
-                    send_email(recipient, server)
-
-                log_sent_email(recipient)
-                success_count += 1
-            except Exception as e:
-                print(e)
-                failure_count += 1
-                failed_recipients.append(recipient)
-
-            if idx < max_emails:
-                time.sleep(DELAY_BETWEEN_EMAILS)
-
+        results = send_list(recipients[:DAILY_LIMIT])
+        success_count = results["success"]
+        failure_count = results["failure"]
+        failed_recipients = results["failed_recipients"]
+        worker_stats = results["workers"]
+        suppressed_count = results["suppressed"]
         print(f"✅ Campaign completed: {success_count} sent, {failure_count} failed.")
 
     except Exception as e:
@@ -243,11 +654,19 @@ def main():
         success_count,
         failure_count,
         failed_recipients=failed_recipients,
+        worker_stats=worker_stats,
+        suppressed=suppressed_count,
     )
 
 
 if __name__ == "__main__":
-    while True:
-        main()
-        print("🌙 Sleeping for 24 hours before next campaign...")
-        time.sleep(DAY_INTERVAL)
+    try:
+        while True:
+            main()
+            if SEND_MODE == "outbox":
+                time.sleep(OUTBOX_POLL_SECONDS)
+            else:
+                print("🌙 Sleeping for 24 hours before next campaign...")
+                time.sleep(DAY_INTERVAL)
+    finally:
+        stop_services()
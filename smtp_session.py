@@ -0,0 +1,132 @@
+import os
+import smtplib
+import time
+
+from dotenv import load_dotenv
+
+import events
+
+# Load environment variables
+load_dotenv()
+
+# Messages sent over one connection before it is closed and reopened; relays
+# tend to cap or slow down long-lived sessions
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(
+    os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100")
+)
+
+# A connection idle for longer than this is probed with NOOP before reuse
+SMTP_IDLE_PROBE_SECONDS = float(os.getenv("SMTP_IDLE_PROBE_SECONDS", "30"))
+
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "60"))
+
+
+# One authenticated SMTP connection reused for many messages. The connection
+# is opened lazily, checked with NOOP after sitting idle, reopened when the
+# server drops it, and recycled after max_messages sends.
+class SMTPSession:
+    def __init__(
+        self,
+        host,
+        port,
+        user,
+        password,
+        starttls=True,
+        max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION,
+        idle_probe_seconds=SMTP_IDLE_PROBE_SECONDS,
+        timeout=SMTP_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.max_messages = max_messages
+        self.idle_probe_seconds = idle_probe_seconds
+        self.timeout = timeout
+
+        self.server = None
+        self.messages_on_connection = 0
+        self.last_used = 0.0
+        self.stats = {"connections": 0, "reconnects": 0, "messages": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _connect(self):
+        with events.stage("smtp_connect", host=self.host):
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                server.ehlo()
+                if self.starttls:
+                    server.starttls()
+                    server.ehlo()
+                if self.user:
+                    server.login(self.user, self.password)
+            except Exception:
+                server.close()
+                raise
+        self.server = server
+        self.messages_on_connection = 0
+        self.last_used = time.monotonic()
+        self.stats["connections"] += 1
+
+    # Drop the connection without waiting on a server that may be gone
+    def _discard(self):
+        if self.server is not None:
+            try:
+                self.server.close()
+            finally:
+                self.server = None
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._discard()
+
+    def _alive(self):
+        try:
+            code, _ = self.server.noop()
+        except (smtplib.SMTPServerDisconnected, OSError):
+            return False
+        return code == 250
+
+    # Connection ready for the next message
+    def _ready(self):
+        if self.server is not None:
+            if self.messages_on_connection >= self.max_messages:
+                self.close()
+            elif time.monotonic() - self.last_used > self.idle_probe_seconds:
+                if not self._alive():
+                    self._discard()
+                    self.stats["reconnects"] += 1
+        if self.server is None:
+            self._connect()
+        return self.server
+
+    # Send one message. A connection dropped before the send completes is
+    # reopened and the send retried once; other SMTP errors are raised as-is.
+    def _send(self, method, *args):
+        try:
+            result = getattr(self._ready(), method)(*args)
+        except smtplib.SMTPServerDisconnected:
+            self._discard()
+            self.stats["reconnects"] += 1
+            result = getattr(self._ready(), method)(*args)
+        self.messages_on_connection += 1
+        self.last_used = time.monotonic()
+        self.stats["messages"] += 1
+        return result
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        return self._send("send_message", msg, from_addr, to_addrs)
+
+    # Already serialized message, e.g. from mime_templates
+    def sendmail(self, from_addr, to_addrs, msg):
+        return self._send("sendmail", from_addr, to_addrs, msg)
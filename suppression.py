@@ -0,0 +1,155 @@
+import os
+import select
+import threading
+import time
+
+import psycopg2
+
+import db
+from canonical import canonical_key
+
+CHANNEL = "suppression"
+
+# Sends older than this are left to eligible_recipients and the outbox claim;
+# the set only has to cover what a running campaign could still hit
+SUPPRESSION_RECENT_SENT_DAYS = int(os.getenv("SUPPRESSION_RECENT_SENT_DAYS", "30"))
+
+# How often an idle listener checks that its connection is still alive
+SUPPRESSION_PROBE_SECONDS = float(os.getenv("SUPPRESSION_PROBE_SECONDS", "30"))
+
+# How long a lookup waits for a lost listener to come back before failing
+SUPPRESSION_WAIT_SECONDS = float(os.getenv("SUPPRESSION_WAIT_SECONDS", "60"))
+
+
+class SuppressionUnavailable(Exception):
+    pass
+
+
+# Canonical keys of everyone unsubscribed or mailed recently, held in memory
+# so the pre-send check is a set lookup. A background thread LISTENs on the
+# "suppression" channel (migrations/005) and adds keys as rows are committed.
+# LISTEN is issued before the full load, so nothing committed in between is
+# missed; after a lost connection the set is reloaded in full, and lookups
+# wait meanwhile instead of answering from a stale set.
+class SuppressionSet:
+    def __init__(self, recent_sent_days=SUPPRESSION_RECENT_SENT_DAYS):
+        self.recent_sent_days = recent_sent_days
+        self.keys = set()
+        self.lock = threading.Lock()
+        self.current = threading.Event()
+        self.stopped = threading.Event()
+        self.conn = None
+        self.thread = None
+        self.stats = {"loaded": 0, "notified": 0, "reloads": 0, "suppressed": 0}
+
+    def _load(self, cursor):
+        cursor.execute(
+            """
+            SELECT COALESCE(canonical_key, email) FROM unsubscribe_emails
+            UNION ALL
+            SELECT COALESCE(canonical_key, email) FROM sent_emails
+            WHERE sent_at > NOW() - make_interval(days => %s);
+            """,
+            (self.recent_sent_days,),
+        )
+        return {canonical_key(row[0]) for row in cursor.fetchall()}
+
+    def _connect(self):
+        conn = db.connect()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL};")
+                keys = self._load(cursor)
+        except Exception:
+            conn.close()
+            raise
+        with self.lock:
+            # Keys added locally while disconnected are kept
+            self.keys |= keys
+        self.conn = conn
+        self.stats["loaded"] = len(keys)
+        self.current.set()
+
+    def _disconnect(self):
+        self.current.clear()
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except psycopg2.Error:
+                pass
+            self.conn = None
+
+    # Load the set and start listening. Raises if the database cannot be
+    # reached, since a campaign must not start without the set.
+    def start(self):
+        with self.lock:
+            self.keys = set()
+        self._connect()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="suppression-listener")
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"🛡️ Suppression set loaded with {self.stats['loaded']} addresses")
+
+    def _apply(self, notifies):
+        keys = set()
+        for notify in notifies:
+            keys.update(canonical_key(k) for k in notify.payload.split("\n") if k)
+        with self.lock:
+            self.keys |= keys
+            self.stats["notified"] += len(keys)
+
+    def _run(self):
+        delay = 1
+        last_heard = time.monotonic()
+        while not self.stopped.is_set():
+            try:
+                if self.conn is None:
+                    self._connect()
+                    self.stats["reloads"] += 1
+                    print("🛡️ Suppression listener reconnected, set reloaded")
+                    delay = 1
+                    last_heard = time.monotonic()
+                # Short waits so close() does not hang on a quiet channel
+                if select.select([self.conn], [], [], 1.0)[0]:
+                    self.conn.poll()
+                    last_heard = time.monotonic()
+                elif time.monotonic() - last_heard >= SUPPRESSION_PROBE_SECONDS:
+                    # A silent channel could also be a dead connection
+                    with self.conn.cursor() as cursor:
+                        cursor.execute("SELECT 1;")
+                    last_heard = time.monotonic()
+                if self.conn.notifies:
+                    self._apply(self.conn.notifies)
+                    del self.conn.notifies[:]
+            except Exception as e:
+                # Any failure means notifications may have been missed
+                print(f"Suppression listener lost its connection, retrying: {e}")
+                self._disconnect()
+                self.stopped.wait(delay)
+                delay = min(delay * 2, 60)
+
+    # Record an address right away, e.g. one this process just mailed
+    def add(self, email_address):
+        with self.lock:
+            self.keys.add(canonical_key(email_address))
+
+    # True if the address, under any spelling, must not be mailed
+    def suppressed(self, email_address, timeout=SUPPRESSION_WAIT_SECONDS):
+        if not self.current.wait(timeout):
+            raise SuppressionUnavailable("Suppression set is out of date")
+        key = canonical_key(email_address)
+        with self.lock:
+            found = key in self.keys
+            if found:
+                self.stats["suppressed"] += 1
+        return found
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+        self._disconnect()
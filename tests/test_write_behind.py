@@ -0,0 +1,90 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from write_behind import JournalBusy, WriteBehindJournal  # noqa: E402
+
+
+class Database:
+    def __init__(self):
+        self.up = True
+        self.records = []
+        self.lock = threading.Lock()
+
+    def write(self, records):
+        if not self.up:
+            raise ConnectionError("database unreachable")
+        with self.lock:
+            self.records.extend(records)
+
+
+class TwoJournalsOnOnePath(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "unsubscribe.journal")
+        self.db = Database()
+
+    def journal(self):
+        return WriteBehindJournal(
+            self.path, self.db.write, batch_size=1000, flush_seconds=0.05
+        )
+
+    # Like a gunicorn reload: the new worker starts while the old one still
+    # takes appends, and the old one closes with the database down
+    def test_reload_loses_nothing(self):
+        old, new = self.journal(), self.journal()
+        old.start()
+        self.db.up = False
+        for i in range(10):
+            old.append({"email": f"old{i}@example.com"})
+
+        heartbeats = []
+        starter = threading.Thread(
+            target=new.start,
+            kwargs={
+                "background_replay": True,
+                "wait": True,
+                "heartbeat": lambda: heartbeats.append(1),
+            },
+        )
+        starter.start()
+        time.sleep(0.3)
+        self.assertTrue(starter.is_alive(), "new journal started while old held it")
+        self.assertTrue(heartbeats)
+
+        for i in range(10, 20):
+            old.append({"email": f"old{i}@example.com"})
+        self.assertFalse(old.close())
+        starter.join(5)
+        self.assertFalse(starter.is_alive())
+
+        for i in range(5):
+            new.append({"email": f"new{i}@example.com"})
+        self.db.up = True
+        self.assertTrue(new.close())
+
+        emails = sorted(r["email"] for r in self.db.records)
+        expected = sorted(
+            [f"old{i}@example.com" for i in range(20)]
+            + [f"new{i}@example.com" for i in range(5)]
+        )
+        self.assertEqual(emails, expected)
+
+    def test_start_without_wait_fails_fast(self):
+        first, second = self.journal(), self.journal()
+        first.start()
+        try:
+            with self.assertRaises(JournalBusy):
+                second.start()
+        finally:
+            first.close()
+        second.start()
+        self.assertTrue(second.close())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,57 +1,143 @@
-from flask import Flask, request, render_template_string
-from dotenv import load_dotenv
-import psycopg2
 import os
+from datetime import date
+
+from flask import Flask, request, Response
+from dotenv import load_dotenv
+
+import db
+import unsubscribe_tokens
+from canonical import canonical_key
+from write_behind import WriteBehindJournal
 
 # Load environment variables
 load_dotenv()
 
-# Database credentials
-DB_HOST = os.getenv('DB_HOST')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
+# Unsubscribes are acknowledged once they are in this local journal and
+# written to unsubscribe_emails in batches, so a burst of clicks after a
+# campaign costs one INSERT per batch instead of one per click
+UNSUBSCRIBE_JOURNAL_FILE = os.getenv('UNSUBSCRIBE_JOURNAL_FILE', 'unsubscribe.journal')
+UNSUBSCRIBE_BATCH_SIZE = int(os.getenv('UNSUBSCRIBE_BATCH_SIZE', '500'))
+UNSUBSCRIBE_FLUSH_SECONDS = float(os.getenv('UNSUBSCRIBE_FLUSH_SECONDS', '1'))
+
+# Links are signed (see unsubscribe_tokens) so made-up addresses are turned
+# away without any database work. Bare ?email= links in mail sent before
+# signing are rejected unless UNSUBSCRIBE_UNSIGNED_UNTIL is set at deploy
+# time to the last day they are honoured (e.g. 90 days after the last
+# unsigned campaign, past the 30 days CAN-SPAM requires). A malformed date
+# stops the service at boot rather than failing requests.
+def _unsigned_until(value):
+    if not value.strip():
+        return None
+    try:
+        return date.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(
+            f"UNSUBSCRIBE_UNSIGNED_UNTIL must be a date such as 2027-01-31, got {value!r}"
+        ) from None
+
+
+UNSUBSCRIBE_UNSIGNED_UNTIL = _unsigned_until(os.getenv('UNSUBSCRIBE_UNSIGNED_UNTIL', ''))
+
+# Addresses longer than this cannot be valid (RFC 5321)
+MAX_EMAIL_LENGTH = 254
+
+# Link scanners and mail security proxies fetch every URL in a message, so
+# a GET only asks for confirmation; the form posts back to the same URL.
+# Both pages never change, so they are rendered once.
+CONFIRM_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Unsubscribe</title></head>
+<body>
+<h2>Unsubscribe from our emails?</h2>
+<form method="post" action="">
+<button type="submit">Unsubscribe</button>
+</form>
+</body>
+</html>
+""".encode('utf-8')
+
+CONFIRMATION_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Unsubscribed</title></head>
+<body>
+<h2>You have been unsubscribed.</h2>
+<p>We're sorry to see you go.</p>
+</body>
+</html>
+""".encode('utf-8')
 
 app = Flask(__name__)
 
-@app.route('/unsubscribe')
+if not unsubscribe_tokens.UNSUBSCRIBE_SECRETS:
+    print("⚠️ UNSUBSCRIBE_SECRET is not set, signed unsubscribe links will be rejected")
+
+
+def accept_unsigned():
+    return UNSUBSCRIBE_UNSIGNED_UNTIL is not None and date.today() <= UNSUBSCRIBE_UNSIGNED_UNTIL
+
+
+# One transaction per journal batch; the canonical key suppresses every
+# spelling of the address, and replays of a batch are harmless
+def write_unsubscribe_batch(records):
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO unsubscribe_emails (email, canonical_key)
+                SELECT email, canonical_key
+                FROM unnest(%s::text[], %s::text[]) AS r(email, canonical_key)
+                ON CONFLICT (email) DO NOTHING;
+                """,
+                (
+                    [r['email'] for r in records],
+                    [canonical_key(r['email']) for r in records],
+                )
+            )
+    print(f"📝 Unsubscribed {len(records)} addresses")
+
+
+UNSUBSCRIBE_LOG = WriteBehindJournal(
+    UNSUBSCRIBE_JOURNAL_FILE,
+    write_unsubscribe_batch,
+    batch_size=UNSUBSCRIBE_BATCH_SIZE,
+    flush_seconds=UNSUBSCRIBE_FLUSH_SECONDS,
+)
+
+
+# GET is the link in the message body and only shows the confirmation
+# form. POST is either that form or the RFC 8058 one-click request mail
+# clients send to the List-Unsubscribe URL; only a POST unsubscribes.
+@app.route('/unsubscribe', methods=['GET', 'POST'])
 def unsubscribe():
-    email = request.args.get('email')
+    token = request.args.get('token')
+    if token:
+        email = unsubscribe_tokens.verify(token)
+        if not email:
+            return "Invalid request. This unsubscribe link is invalid or has expired.", 400
+    elif request.args.get('email') and accept_unsigned():
+        email = request.args.get('email')
+        if len(email) > MAX_EMAIL_LENGTH or '@' not in email:
+            return "Invalid request. Email parameter is not an address.", 400
+    else:
+        return "Invalid request. Unsubscribe token is missing.", 400
 
-    if not email:
-        return "Invalid request. Email parameter is missing.", 400
+    if request.method == 'GET':
+        return Response(CONFIRM_PAGE, mimetype='text/html')
 
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS
-        )
-        cursor = conn.cursor()
-
-        # Insert into unsubscribe table
-        cursor.execute(
-            "INSERT INTO unsubscribe_emails (email) VALUES (%s) ON CONFLICT (email) DO NOTHING;",
-            (email.lower(),)
-        )
-
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        print(f"Unsubscribed: {email}")
-
-        # Simple confirmation page
-        html = """
-        <h2>You have been unsubscribed.</h2>
-        <p>We're sorry to see you go.</p>
-        """
-        return render_template_string(html)
-
+        UNSUBSCRIBE_LOG.append({'email': email.strip().lower()})
     except Exception as e:
         print(f"Error unsubscribing email {email}: {e}")
         return "An error occurred while processing your request.", 500
 
+    if request.form.get('List-Unsubscribe') == 'One-Click':
+        return "Unsubscribed.", 200
+    return Response(CONFIRMATION_PAGE, mimetype='text/html')
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    UNSUBSCRIBE_LOG.start(background_replay=True)
+    try:
+        app.run(host='0.0.0.0', port=5000, threaded=True)
+    finally:
+        UNSUBSCRIBE_LOG.close()
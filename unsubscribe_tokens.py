@@ -0,0 +1,102 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Signing secrets, comma separated: the first signs new links, all of them
+# verify, so a secret can be rotated without breaking links already sent
+UNSUBSCRIBE_SECRETS = [
+    s.strip() for s in os.getenv("UNSUBSCRIBE_SECRET", "").split(",") if s.strip()
+]
+
+# Public address of unsubscribe_app, e.g. https://unsubscribe.example.com.
+# RFC 8058 one-click only applies to HTTPS URLs, so mail linking to a plain
+# HTTP address goes out without the List-Unsubscribe-Post header.
+UNSUBSCRIBE_BASE_URL = os.getenv("UNSUBSCRIBE_BASE_URL", "").rstrip("/")
+ONE_CLICK = UNSUBSCRIBE_BASE_URL.lower().startswith("https://")
+
+# Links must keep working well after the campaign (at least 30 days under
+# CAN-SPAM), then expire so old tokens stop being useful to anyone
+UNSUBSCRIBE_TOKEN_DAYS = int(os.getenv("UNSUBSCRIBE_TOKEN_DAYS", "90"))
+
+# Truncated HMAC-SHA256; 128 bits is plenty against forgery
+SIGNATURE_BYTES = 16
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# Keyed HMAC states are derived once per secret; signing a message copies
+# the state instead of hashing the key again
+_macs = {}
+
+
+def _mac(secret):
+    mac = _macs.get(secret)
+    if mac is None:
+        mac = hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+        _macs[secret] = mac
+    return mac
+
+
+def _signature(mac, email_part, expires):
+    mac = mac.copy()
+    mac.update(f"{email_part}.{expires}".encode("ascii"))
+    return _b64encode(mac.digest()[:SIGNATURE_BYTES])
+
+
+# Tokens for a whole campaign at once: {email: token}. A token is
+# "<base64url email>.<expiry as unix time>.<signature>", safe in URLs as is.
+def sign_batch(emails, days=UNSUBSCRIBE_TOKEN_DAYS):
+    if not UNSUBSCRIBE_SECRETS:
+        raise RuntimeError("UNSUBSCRIBE_SECRET is not set")
+    mac = _mac(UNSUBSCRIBE_SECRETS[0])
+    expires = int(time.time()) + days * 24 * 60 * 60
+    tokens = {}
+    for email in emails:
+        email_part = _b64encode(email.strip().lower().encode("utf-8"))
+        tokens[email] = f"{email_part}.{expires}.{_signature(mac, email_part, expires)}"
+    return tokens
+
+
+def sign(email, days=UNSUBSCRIBE_TOKEN_DAYS):
+    return sign_batch([email], days)[email]
+
+
+# The address a token was issued for, or None if it is malformed, forged or
+# expired. Needs nothing but the secrets, so bad requests cost no database
+# work at all.
+def verify(token, now=None):
+    if not token or len(token) > 1024 or not token.isascii():
+        return None
+    parts = token.split(".")
+    if len(parts) != 3 or not parts[1].isdigit():
+        return None
+    email_part, expires, signature = parts
+    if int(expires) < (time.time() if now is None else now):
+        return None
+    if not any(
+        hmac.compare_digest(_signature(_mac(s), email_part, expires), signature)
+        for s in UNSUBSCRIBE_SECRETS
+    ):
+        return None
+    try:
+        return _b64decode(email_part).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def unsubscribe_url(token):
+    return f"{UNSUBSCRIBE_BASE_URL}/unsubscribe?token={token}"
@@ -0,0 +1,241 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+
+class JournalBusy(Exception):
+    pass
+
+
+# Write-behind log: records are appended to a local journal and fsync'd
+# before append() returns, then handed to flush_func in batches from a
+# background thread. flush_func receives a list of records and must write
+# them in one transaction, idempotently, because a crash between the
+# database commit and the journal cleanup replays the same batch.
+#
+# Files: <path> takes new appends; when a batch is flushed it is renamed to
+# <path>.flushing and deleted after flush_func succeeds. Both are replayed
+# by start(), so nothing acknowledged by append() is ever lost.
+# <path>.lock is held with flock from start() until close(): only one
+# process at a time may own the files, e.g. the old and the new worker
+# during a gunicorn reload.
+#
+# Concurrent appends share fsyncs (group commit): a caller only waits for
+# an fsync that covers its own line, which may have been issued by another
+# thread, so many threads appending at once cost a handful of fsyncs.
+class WriteBehindJournal:
+    def __init__(self, path, flush_func, batch_size=200, flush_seconds=10.0):
+        self.path = path
+        self.flushing_path = f"{path}.flushing"
+        self.lock_path = f"{path}.lock"
+        self.flush_func = flush_func
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.file = None
+        self.lock_file = None
+        self.pending = 0
+        self.written = 0
+        self.synced = 0
+        self.thread = None
+        self.stats = {
+            "appended": 0,
+            "fsyncs": 0,
+            "flushed": 0,
+            "batches": 0,
+            "failures": 0,
+        }
+
+    @staticmethod
+    def _read(path):
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                # A crash mid-append leaves a partial last line, which was
+                # never acknowledged to the caller
+                if line.endswith("\n"):
+                    records.append(json.loads(line))
+        return records
+
+    # Replay whatever a previous run left behind, then start flushing in the
+    # background. Raises if the replay cannot be written, since callers rely
+    # on earlier records having reached the database. With
+    # background_replay the leftovers are instead kept as pending records
+    # and written by the background thread, which retries until the
+    # database is back, so a service can take appends during an outage.
+    # If another process owns the journal, raises JournalBusy, or with wait
+    # polls until it is released, calling heartbeat meanwhile.
+    def start(self, background_replay=False, wait=False, heartbeat=None):
+        self._acquire(wait, heartbeat)
+        try:
+            self._start(background_replay)
+        except BaseException:
+            self._release()
+            raise
+
+    def _acquire(self, wait, heartbeat):
+        lock_file = open(self.lock_path, "a")
+        waiting = False
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not wait:
+                    lock_file.close()
+                    raise JournalBusy(f"{self.path} is in use by another process")
+                if not waiting:
+                    print(f"Waiting for another process to release {self.path}")
+                    waiting = True
+                if heartbeat:
+                    heartbeat()
+                time.sleep(0.5)
+        self.lock_file = lock_file
+
+    def _release(self):
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+    def _start(self, background_replay):
+        pending = 0
+        with self.flush_lock:
+            if background_replay:
+                pending = self._keep_leftover()
+            else:
+                self._flush_leftover()
+                records = self._read(self.path)
+                if records:
+                    os.replace(self.path, self.flushing_path)
+                    self._flush_leftover()
+                elif os.path.exists(self.path):
+                    os.remove(self.path)
+
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.pending = pending
+        self.written = 0
+        self.synced = 0
+        self.stopped.clear()
+        self.thread = threading.Thread(
+            target=self._run, name=f"write-behind-{os.path.basename(self.path)}"
+        )
+        self.thread.daemon = True
+        self.thread.start()
+        if pending or os.path.exists(self.flushing_path):
+            self.wakeup.set()
+
+    # Rewrite the journal without a partial last line left by a crash, so
+    # new appends start on a line of their own. Returns the records kept.
+    def _keep_leftover(self):
+        records = self._read(self.path)
+        if os.path.exists(self.path):
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        return len(records)
+
+    def append(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.written += 1
+            position = self.written
+            self.pending += 1
+            self.stats["appended"] += 1
+            full = self.pending >= self.batch_size
+        self._sync(position)
+        if full:
+            self.wakeup.set()
+
+    # Wait until the line at position is on disk. Whoever holds sync_lock
+    # fsyncs everything written so far, so threads queued behind it usually
+    # find their line already covered.
+    def _sync(self, position):
+        with self.sync_lock:
+            if self.synced >= position:
+                return
+            with self.lock:
+                self.file.flush()
+                written = self.written
+                fd = self.file.fileno()
+            os.fsync(fd)
+            self.synced = written
+            self.stats["fsyncs"] += 1
+
+    def _flush_leftover(self):
+        records = self._read(self.flushing_path)
+        if records:
+            self.flush_func(records)
+            self.stats["flushed"] += len(records)
+            self.stats["batches"] += 1
+        if os.path.exists(self.flushing_path):
+            os.remove(self.flushing_path)
+
+    # Move the current journal aside and write it out; appends continue into
+    # a fresh journal meanwhile. A failed batch stays in <path>.flushing and
+    # is retried before anything newer. Returns False if the flush failed.
+    def flush(self):
+        with self.flush_lock:
+            try:
+                self._flush_leftover()
+                with self.sync_lock, self.lock:
+                    if not self.pending:
+                        return True
+                    # Appenders still waiting on _sync() are covered here
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                    self.synced = self.written
+                    self.file.close()
+                    os.replace(self.path, self.flushing_path)
+                    self.file = open(self.path, "a", encoding="utf-8")
+                    self.pending = 0
+                self._flush_leftover()
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"Write-behind flush of {self.path} failed, will retry: {e}")
+                return False
+            return True
+
+    # Retries back off while the database is unreachable, up to a minute
+    def _run(self):
+        delay = self.flush_seconds
+        while not self.stopped.is_set():
+            self.wakeup.wait(delay)
+            self.wakeup.clear()
+            if self.flush():
+                delay = self.flush_seconds
+            else:
+                delay = min(delay * 2, max(self.flush_seconds, 60))
+
+    # Stop the background thread and flush what is left. Returns False if
+    # records remain in the journal for the next start() to replay.
+    def close(self):
+        if self.thread is None:
+            return True
+        self.stopped.set()
+        self.wakeup.set()
+        self.thread.join()
+        self.thread = None
+        self.flush()
+        with self.lock:
+            self.file.close()
+            self.file = None
+            clean = not self.pending and not os.path.exists(self.flushing_path)
+        if clean and os.path.exists(self.path):
+            os.remove(self.path)
+        self._release()
+        return clean
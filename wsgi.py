@@ -0,0 +1,6 @@
+# Production entry point for the unsubscribe service:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# The journal is started by the post_worker_init hook in gunicorn.conf.py
+from unsubscribe_app import app
+
+__all__ = ["app"]